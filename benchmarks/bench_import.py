@@ -0,0 +1,76 @@
+"""Measures the cold import time of waifuim with `python -X importtime` and checks that the light entry points do not
+pull in aiohttp or dateutil.
+
+Usage: python benchmarks/bench_import.py [--repeat 5] [--max-ms 0]
+
+Exits with a non-zero status if a light import loads a heavy dependency, or if --max-ms is given and the median
+import time of `waifuim` is above it.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (statement, modules that must not be imported by it)
+CASES = (
+    ('import waifuim', ('aiohttp', 'dateutil')),
+    ('from waifuim import Image, LazyImage, Tag', ('aiohttp', 'dateutil')),
+    ('from waifuim import Query, WaifuException', ('aiohttp', 'dateutil')),
+    ('from waifuim import WaifuAioClient', ()),
+)
+
+
+def import_time(statement):
+    """Runs the statement in a fresh interpreter and returns (cumulative import time in ms, imported modules)."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (ROOT, os.environ.get('PYTHONPATH')))))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True, check=True,
+    )
+    total = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name.rstrip()[1:]
+        # Only top level imports (no indentation) are counted, their cumulative time includes the children.
+        if not name.startswith(' '):
+            total += int(cumulative)
+        modules.add(name.strip())
+    return total / 1000, modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='fresh interpreters per statement')
+    parser.add_argument('--max-ms', type=float, default=0, help='fail if `import waifuim` is slower (0 to disable)')
+    args = parser.parse_args(argv)
+
+    failed = False
+    baseline = None
+    for statement, forbidden in CASES:
+        try:
+            runs = [import_time(statement) for _ in range(args.repeat)]
+        except subprocess.CalledProcessError as e:
+            print(f'{statement:<45} failed: {e.stderr.strip().splitlines()[-1]}')
+            failed = True
+            continue
+        median = statistics.median(elapsed for elapsed, _ in runs)
+        leaked = sorted(name for name in forbidden if any(name in modules for _, modules in runs))
+        print(f'{statement:<45} {median:8.2f} ms' + (f'  imports {", ".join(leaked)}!' if leaked else ''))
+        failed = failed or bool(leaked)
+        if baseline is None:
+            baseline = median
+
+    if args.max_ms and baseline is not None and baseline > args.max_ms:
+        print(f'import waifuim took {baseline:.2f} ms, more than {args.max_ms:.2f} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""Compares the cost of building Image objects with the __slots__ models and with the previous setattr based models.
+
+Usage: python benchmarks/bench_types.py [--images 30] [--pages 2000]
+"""
+import argparse
+import os
+import sys
+import timeit
+import tracemalloc
+
+# Benchmark the working tree rather than an installed release.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from dateutil.parser import parse
+
+from fixtures import make_image_data
+from waifuim.types import Image
+
+
+class LegacyArtist:
+    def __init__(self, data):
+        for key, values in data.items():
+            setattr(self, key.lower(), values)
+
+
+class LegacyTag:
+    def __init__(self, data):
+        for key, values in data.items():
+            setattr(self, key.lower(), values)
+
+
+class LegacyImage:
+    def __init__(self, data):
+        for key, values in data.items():
+            setattr(self, key.lower(), values)
+        self.tags = [LegacyTag(tag) for tag in self.tags]
+        if self.artist is not None:
+            self.artist = LegacyArtist(self.artist)
+        self.uploaded_at = parse(self.uploaded_at)
+
+
+def measure_memory(cls, pages):
+    tracemalloc.start()
+    objects = [cls(im) for page in pages for im in page]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(objects)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--images', type=int, default=30, help='images per page')
+    parser.add_argument('--pages', type=int, default=2000, help='number of pages to parse')
+    args = parser.parse_args(argv)
+
+    pages = [[make_image_data(p * args.images + i) for i in range(args.images)] for p in range(args.pages)]
+    for name, cls in (('legacy', LegacyImage), ('slots', Image)):
+        elapsed = min(timeit.repeat(lambda: [cls(im) for page in pages for im in page], number=1, repeat=3))
+        count = args.images * args.pages
+        print(f'{name:>6}: {elapsed / count * 1e6:7.2f} us/image, {measure_memory(cls, pages):7.0f} B/image')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
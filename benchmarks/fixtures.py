@@ -0,0 +1,42 @@
+"""Fake API payloads shared by the benchmarks."""
+
+TAGS = [
+    {'tag_id': 12, 'name': 'waifu', 'description': 'A female anime/manga character.', 'is_nsfw': False},
+    {'tag_id': 4, 'name': 'maid', 'description': 'Cute womans or girl employed in domestic service.',
+     'is_nsfw': False},
+    {'tag_id': 5, 'name': 'marin-kitagawa', 'description': 'One of the main characters of Sono Bisque Doll.',
+     'is_nsfw': False},
+    {'tag_id': 7, 'name': 'selfies', 'description': 'A photo-like image of a waifu.', 'is_nsfw': False},
+    {'tag_id': 9, 'name': 'ero', 'description': 'Any kind of erotic content, basically any nsfw image.',
+     'is_nsfw': True},
+    {'tag_id': 11, 'name': 'hentai', 'description': 'Explicit sexual content.', 'is_nsfw': True},
+]
+
+
+def make_image_data(image_id, padding=0):
+    """Returns the json of an image, padding adds that many characters to the source to grow the payload."""
+    return {
+        'signature': f'{image_id:016x}',
+        'extension': '.gif' if image_id % 7 == 0 else '.jpg',
+        'image_id': image_id,
+        'favorites': image_id % 50,
+        'dominant_color': '#363a4e',
+        'source': 'https://www.pixiv.net/en/artworks/88563313' + 'x' * padding,
+        'artist': {
+            'artist_id': 1,
+            'name': 'Fiqsi',
+            'patreon': None,
+            'pixiv': 'https://www.pixiv.net/users/38279179',
+            'twitter': 'https://twitter.com/Fiqsi',
+            'deviant_art': None,
+        },
+        'uploaded_at': '2021-11-02T11:16:19.048684+00:00',
+        'liked_at': None,
+        'is_nsfw': TAGS[image_id % len(TAGS)]['is_nsfw'],
+        'width': 1000 + (image_id * 37) % 2000,
+        'height': 1000 + (image_id * 53) % 2000,
+        'byte_size': 100000 + (image_id * 7919) % 5000000,
+        'url': f'https://cdn.waifu.im/{image_id}.jpg',
+        'preview_url': f'https://www.waifu.im/preview/{image_id}/',
+        'tags': [TAGS[0], TAGS[image_id % len(TAGS)]] if image_id % len(TAGS) else [TAGS[0]],
+    }
@@ -0,0 +1,134 @@
+"""A local fake of the waifu.im API, used by the benchmarks.
+
+It serves /search, /fav, /fav/insert, /fav/delete, /fav/toggle, /report and /tags with a configurable latency, error
+rate and payload size. Run it standalone with: python benchmarks/mock_server.py [--port 8080] [--latency 0.02]
+"""
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+from fixtures import TAGS, make_image_data
+
+
+class MockAPI:
+    def __init__(self, latency=0.0, error_rate=0.0, catalog_size=10000, padding=0, seed=None):
+        """
+        Attributes:
+            latency: The time (in seconds) every response is delayed by.
+            error_rate: The probability for a request to fail with a 500 status code.
+            catalog_size: The number of images the fake API knows.
+            padding: The number of characters added to each image json, to grow the payloads.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.images = [make_image_data(image_id, padding) for image_id in range(1, catalog_size + 1)]
+        self.favorites = set(range(1, min(catalog_size, 200) + 1))
+        self.requests = 0
+
+    @web.middleware
+    async def middleware(self, request, handler):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return web.json_response({'detail': 'Internal Server Error'}, status=500)
+        return await handler(request)
+
+    def _select(self, request, images):
+        query = request.query
+        excluded = {int(i) for i in query.getall('excluded_files', ()) if i.isdigit()}
+        included_tags = set(query.getall('included_tags', ()))
+        selected = [
+            im for im in images
+            if im['image_id'] not in excluded
+            and included_tags.issubset(tag['name'] for tag in im['tags'])
+        ]
+        if not selected:
+            raise web.HTTPNotFound(text='{"detail": "No image found matching the criteria given."}',
+                                   content_type='application/json')
+        return selected
+
+    async def search(self, request):
+        selected = self._select(request, self.images)
+        if request.query.get('full', '').lower() == 'true':
+            return web.json_response({'images': selected})
+        limit = int(request.query.get('limit', 1))
+        return web.json_response({'images': self.random.sample(selected, min(limit, len(selected)))})
+
+    async def fav(self, request):
+        images = [self.images[image_id - 1] for image_id in sorted(self.favorites)]
+        return web.json_response({'images': self._select(request, images)})
+
+    async def fav_insert(self, request):
+        image_id = (await request.json())['image_id']
+        self.favorites.add(image_id)
+        return web.json_response({'detail': 'Image inserted.'})
+
+    async def fav_delete(self, request):
+        image_id = (await request.json())['image_id']
+        self.favorites.discard(image_id)
+        return web.json_response({'detail': 'Image deleted.'})
+
+    async def fav_toggle(self, request):
+        image_id = (await request.json())['image_id']
+        if image_id in self.favorites:
+            self.favorites.discard(image_id)
+            return web.json_response({'state': 'DELETED'})
+        self.favorites.add(image_id)
+        return web.json_response({'state': 'INSERTED'})
+
+    async def report(self, request):
+        data = await request.json()
+        return web.json_response({'author_id': data.get('user_id'), 'image_id': data['image_id'],
+                                  'description': data.get('description'), 'existed': False}, status=201)
+
+    async def tags(self, request):
+        if request.query.get('full') == 'True':
+            return web.json_response({
+                'versatile': [tag for tag in TAGS if not tag['is_nsfw']],
+                'nsfw': [tag for tag in TAGS if tag['is_nsfw']],
+            })
+        return web.json_response({
+            'versatile': [tag['name'] for tag in TAGS if not tag['is_nsfw']],
+            'nsfw': [tag['name'] for tag in TAGS if tag['is_nsfw']],
+        })
+
+    def create_app(self):
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_get('/search', self.search)
+        app.router.add_get('/fav', self.fav)
+        app.router.add_post('/fav/insert', self.fav_insert)
+        app.router.add_post('/fav/delete', self.fav_delete)
+        app.router.add_post('/fav/toggle', self.fav_toggle)
+        app.router.add_post('/report', self.report)
+        app.router.add_get('/tags', self.tags)
+        return app
+
+
+async def start_server(api, host='127.0.0.1', port=0):
+    """Starts the fake API and returns the runner and the base url to pass to WaifuAioClient."""
+    runner = web.AppRunner(api.create_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f'http://{host}:{port}/'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--padding', type=int, default=0)
+    args = parser.parse_args(argv)
+    api = MockAPI(latency=args.latency, error_rate=args.error_rate, padding=args.padding)
+    web.run_app(api.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Runs the benchmark suite against a local fake of the API and writes the results as json.
+
+Usage: python benchmarks/run.py [--output results.json] [--compare previous.json] [--requests 2000]
+                                [--concurrency 50] [--latency 0.0] [--error-rate 0.0] [--padding 0]
+
+Measured:
+  - requests/sec and p50/p99 latency of search, tags and fav through WaifuAioClient
+  - memory per 10k Image (and LazyImage) objects
+  - the cost of WaifuAioClient._create_params and Image.__init__
+  - the latency of a local ImageStore query over 10k images
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+import tracemalloc
+
+# Benchmark the working tree rather than an installed release.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fixtures import make_image_data
+from mock_server import MockAPI, start_server
+
+import waifuim
+from waifuim import ImageStore, Query, WaifuAioClient
+from waifuim.types import Image, LazyImage
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+async def bench_endpoint(client, call, requests, concurrency):
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run():
+        nonlocal errors
+        async with semaphore:
+            started_at = time.perf_counter()
+            try:
+                await call()
+            except waifuim.WaifuException:
+                errors += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(run() for _ in range(requests)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        'requests': requests,
+        'errors': errors,
+        'requests_per_second': requests / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+    }
+
+
+async def bench_http(args):
+    api = MockAPI(latency=args.latency, error_rate=args.error_rate, padding=args.padding, seed=0)
+    runner, base_url = await start_server(api)
+    results = {}
+    try:
+        # coalescing is disabled so that every call reaches the server
+        async with WaifuAioClient(base_url=base_url, token='benchmark', coalesce=False) as client:
+            calls = {
+                'search': lambda: client.search(included_tags=['waifu'], limit=30),
+                'search_lazy': lambda: client.search(included_tags=['waifu'], limit=30, lazy=True),
+                'tags': lambda: client.tags(full=True),
+                'fav': lambda: client.fav(),
+            }
+            for name, call in calls.items():
+                results[name] = await bench_endpoint(client, call, args.requests, args.concurrency)
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def bench_memory(count=10000):
+    data = [make_image_data(image_id) for image_id in range(1, count + 1)]
+    results = {}
+    for name, cls in (('image', Image), ('lazy_image', LazyImage)):
+        tracemalloc.start()
+        objects = [cls(im) for im in data]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del objects
+        results[f'{name}_bytes_per_10k'] = size * 10000 / count
+    return results
+
+
+def bench_cpu(number=20000):
+    data = make_image_data(1982)
+    kwargs = dict(included_tags=['waifu', 'maid'], excluded_tags=['ero'], excluded_files=[1, 2, 3], is_nsfw=False,
+                  limit=30, order_by='FAVORITES', orientation='LANDSCAPE', width='>=2000', gif=False)
+    timings = {
+        'create_params_us': lambda: WaifuAioClient._create_params(**kwargs),
+        'image_init_us': lambda: Image(data),
+        'lazy_image_init_us': lambda: LazyImage(data),
+    }
+    return {name: min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6 for name, func in timings.items()}
+
+
+def bench_engine(count=10000, number=2000):
+    store = ImageStore(LazyImage(make_image_data(image_id)) for image_id in range(1, count + 1))
+    query = Query(included_tags=['waifu'], orientation='LANDSCAPE', gif=False, width='>=1000', limit=10)
+    timings = {
+        'store_query_us': lambda: store.search(query, order_by='byte_size'),
+        'store_count_us': lambda: store.count(query),
+    }
+    return {name: min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6 for name, func in timings.items()}
+
+
+def compare(results, previous):
+    """Prints the relative change of every numeric result compared to a previous run."""
+    def flatten(d, prefix=''):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                yield from flatten(v, f'{prefix}{k}.')
+            elif isinstance(v, (int, float)):
+                yield f'{prefix}{k}', v
+
+    old = dict(flatten(previous['results']))
+    for name, value in flatten(results['results']):
+        if old.get(name):
+            print(f'{name:50} {old[name]:14.2f} -> {value:14.2f} ({(value - old[name]) / old[name]:+.1%})')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='where to write the json results, printed if not provided')
+    parser.add_argument('--compare', help='a previous json results file to compare with')
+    parser.add_argument('--requests', type=int, default=2000, help='requests sent per endpoint')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0, help='latency (in seconds) added by the fake API')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 500 response')
+    parser.add_argument('--padding', type=int, default=0, help='characters added to each image json')
+    args = parser.parse_args(argv)
+
+    results = {
+        'waifuim_version': waifuim.__version__,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time(),
+        'parameters': vars(args),
+        'results': {
+            'http': asyncio.run(bench_http(args)),
+            'memory': bench_memory(),
+            'cpu': bench_cpu(),
+            'engine': bench_engine(),
+        },
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,7 +21,7 @@ setup(
     author_email='bucolo33fr@gmail.com',
     long_description=readme,
     long_description_content_type='text/markdown',
-    python_requires='>=3.6',
+    python_requires='>=3.7',
     install_requires=['aiohttp', 'python-dateutil'],
     classifiers=[
         'Development Status :: 5 - Production/Stable',
@@ -30,7 +30,6 @@ setup(
         'Natural Language :: English',
         'Operating System :: OS Independent',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
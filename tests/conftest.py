@@ -0,0 +1,35 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The mock server lives with the benchmarks and imports its fixtures as a top level module.
+for path in (ROOT, os.path.join(ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture
+def serve():
+    """Returns an async context manager starting an aiohttp app or a MockAPI and yielding its base url."""
+    from aiohttp import web
+    from mock_server import start_server
+
+    @contextlib.asynccontextmanager
+    async def _serve(api):
+        if isinstance(api, web.Application):
+            runner = web.AppRunner(api)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            base_url = f'http://127.0.0.1:{runner.addresses[0][1]}/'
+        else:
+            runner, base_url = await start_server(api)
+        try:
+            yield base_url
+        finally:
+            await runner.cleanup()
+
+    return _serve
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from waifuim import CircuitBreaker, CircuitOpen, WaifuAioClient, WaifuException
+
+
+def make_app(state):
+    async def search(request):
+        if state['mode'] == 'down':
+            return web.json_response({'detail': 'Service Unavailable'}, status=503)
+        if state['mode'] == 'html':
+            return web.Response(text='<html>maintenance</html>', content_type='text/html')
+        return web.json_response({'images': [{'image_id': 1, 'tags': []}]})
+
+    app = web.Application()
+    app.router.add_get('/search', search)
+    return app
+
+
+def test_breaker_opens_and_fails_fast(serve):
+    async def main():
+        state = {'mode': 'down'}
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+        async with serve(make_app(state)) as url, WaifuAioClient(base_url=url, circuit_breaker=breaker) as client:
+            with pytest.raises(WaifuException):
+                await client.search(raw=True)
+            assert breaker.state == 'open'
+            with pytest.raises(CircuitOpen):
+                await client.search(raw=True)
+
+    asyncio.run(main())
+
+
+def test_failed_probe_does_not_leak(serve):
+    # A probe failing with something else than a transient error (here an undecodable body) must still end the half
+    # open state, or the breaker would stay half open with no probe allowed forever.
+    async def main():
+        state = {'mode': 'down'}
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        async with serve(make_app(state)) as url, WaifuAioClient(base_url=url, circuit_breaker=breaker) as client:
+            for mode in ('down', 'html'):
+                state['mode'] = mode
+                with pytest.raises(Exception):
+                    await client.search(raw=True)
+                await asyncio.sleep(0.06)
+            state['mode'] = 'ok'
+            assert (await client.search()).image_id == 1
+            assert breaker.state == 'closed'
+
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import asyncio
+import fnmatch
+
+import pytest
+
+from mock_server import MockAPI
+from waifuim import RedisBackend, ResponseCache, WaifuAioClient
+
+
+def test_cached_responses_are_not_shared(serve):
+    async def main():
+        async with serve(MockAPI(catalog_size=100)) as url, WaifuAioClient(base_url=url, cache=ResponseCache()) as client:
+            first = await client.tags(raw=True)
+            expected = {key: list(value) for key, value in first.items()}
+            first['versatile'].append('poisoned')
+            second = await client.tags(raw=True)
+            second['versatile'].append('poisoned')
+            assert await client.tags(raw=True) == expected
+            assert client.cache.hits == 2
+
+    asyncio.run(main())
+
+
+class FakeRedis:
+    """The subset of redis.asyncio.Redis used by RedisBackend, the values are kept in a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, px=None):
+        assert isinstance(value, bytes)
+        self.data[key] = value
+
+    async def scan_iter(self, match='*'):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match):
+                yield key
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+def test_redis_backend():
+    async def main():
+        backend = RedisBackend(FakeRedis(), prefix='test:')
+        await backend.set('tags|-|1', {'response': {'versatile': ['maid']}}, 60)
+        assert await backend.get('tags|-|1') == {'response': {'versatile': ['maid']}}
+        assert await backend.get('tags|-|2') is None
+        await backend.delete_matching('tags|*')
+        assert backend.redis.data == {}
+
+    asyncio.run(main())
+
+
+def test_redis_undecodable_entries_are_misses(serve):
+    # Another host may have written msgpack entries while msgpack is not installed here, or an older format.
+    async def main():
+        redis = FakeRedis()
+        cache = ResponseCache(backend=RedisBackend(redis))
+        async with serve(MockAPI(catalog_size=100)) as url, WaifuAioClient(base_url=url, cache=cache) as client:
+            expected = await client.tags(raw=True)
+            assert await client.tags(raw=True) == expected and cache.hits == 1
+            for key in redis.data:
+                redis.data[key] = b'\x00\x81\xa8response'
+            assert await client.tags(raw=True) == expected
+            for key in redis.data:
+                redis.data[key] = b'j{not json'
+            assert await client.tags(raw=True) == expected
+            assert cache.hits == 1
+
+    asyncio.run(main())
+
+
+def test_close_cancels_the_refreshes(serve):
+    async def main():
+        api = MockAPI(catalog_size=100)
+        cache = ResponseCache(endpoint_ttls={'tags': 0.01}, stale_ttl=60)
+        async with serve(api) as url:
+            client = WaifuAioClient(base_url=url, cache=cache)
+            await client.tags(raw=True)
+            await asyncio.sleep(0.02)
+            api.latency = 0.1
+            await client.tags(raw=True)  # stale, refreshed in the background
+            assert client._revalidating
+            await client.close()
+            assert not client._revalidating
+            await asyncio.sleep(0.15)
+            assert client.session is None
+            with pytest.raises(RuntimeError):
+                await client.tags(raw=True, use_cache=False)
+
+    asyncio.run(main())
+
+
+def test_ttl():
+    cache = ResponseCache()
+    assert cache.ttl_for('tags') == 3600 and cache.ttl_for('report') == 60
+    cache = ResponseCache(ttl=None, endpoint_ttls={'tags': 10})
+    assert cache.ttl_for('tags') == 10
+    assert cache.ttl_for('search') is None and cache.ttl_for('fav') is None
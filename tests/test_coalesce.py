@@ -0,0 +1,40 @@
+import asyncio
+
+from mock_server import MockAPI
+from waifuim import WaifuAioClient
+
+
+def test_coalesced_callers_get_their_own_response(serve):
+    async def main():
+        api = MockAPI(catalog_size=100, latency=0.05)
+        async with serve(api) as url, WaifuAioClient(base_url=url) as client:
+            async def mutate():
+                infos = await client.tags(raw=True)
+                infos['versatile'].append('poisoned')  # before the other callers resume
+                return infos
+
+            api.requests = 0
+            first, second, third = await asyncio.gather(mutate(), client.tags(raw=True), client.tags(raw=True))
+            assert api.requests == 1 and client.coalesced_requests == 2
+            assert second is not third
+            assert 'poisoned' not in second['versatile'] and second == third
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_others(serve):
+    async def main():
+        async with serve(MockAPI(catalog_size=100, latency=0.05)) as url, WaifuAioClient(base_url=url) as client:
+            first = asyncio.ensure_future(client.tags(raw=True))
+            second = asyncio.ensure_future(client.tags(raw=True))
+            await asyncio.sleep(0.01)
+            second.cancel()
+            assert 'versatile' in await first
+            third = asyncio.ensure_future(client.tags(raw=True))
+            await asyncio.sleep(0.01)
+            first = asyncio.ensure_future(client.tags(raw=True))
+            await asyncio.sleep(0.01)
+            third.cancel()
+            assert 'versatile' in await first
+
+    asyncio.run(main())
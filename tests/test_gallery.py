@@ -0,0 +1,32 @@
+import asyncio
+
+from mock_server import MockAPI
+from waifuim import DirectorySnapshotStore, GallerySync, WaifuAioClient
+
+
+def test_sync_single_request(serve, tmp_path):
+    async def main():
+        api = MockAPI(catalog_size=3000)
+        api.favorites = set(range(1, 3001))
+        async with serve(api) as url, WaifuAioClient(base_url=url, token='token') as client:
+            gallery_sync = GallerySync(client, store=DirectorySnapshotStore(tmp_path))
+            api.requests = 0
+            delta = await gallery_sync.sync()
+            assert api.requests == 1
+            assert sorted(image.image_id for image in delta.added) == list(range(1, 3001))
+            assert delta.removed == []
+
+            api.favorites -= {10, 20}
+            api.requests = 0
+            delta = await gallery_sync.sync(commit=False)
+            assert delta.added == [] and sorted(delta.removed) == [10, 20]
+            # Not committed, the next sync reports the same changes.
+            assert sorted((await gallery_sync.sync()).removed) == [10, 20]
+            assert not await gallery_sync.sync()
+            assert api.requests == 3
+
+            api.favorites = set()
+            delta = await gallery_sync.sync()
+            assert len(delta.removed) == 2998 and delta.scanned == 0
+
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import pickle
+import threading
+
+import pytest
+from aiohttp import web
+
+from mock_server import MockAPI, start_server
+from waifuim import (
+    APIException, CircuitOpen, DownloadError, HarvestError, InvalidQuery, NoToken, Query, RateLimited,
+)
+from waifuim.harvest import Harvester, Partition
+
+
+class FailingAPI(MockAPI):
+    """Refuses the searches on the maid tag."""
+
+    async def search(self, request):
+        if 'maid' in request.query.getall('included_tags', ()):
+            return web.json_response({'detail': 'Forbidden'}, status=403)
+        return await super().search(request)
+
+
+@pytest.fixture
+def serve_in_thread():
+    """Starts a MockAPI and returns its base url.
+    The harvester runs its workers in other processes, so the server runs in a thread with its own loop.
+    """
+    servers = []
+
+    def _serve(api):
+        loop = asyncio.new_event_loop()
+        runner, url = loop.run_until_complete(start_server(api))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        servers.append((loop, runner, thread))
+        return url
+
+    yield _serve
+    for loop, runner, thread in servers:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+
+@pytest.mark.parametrize('error', [
+    APIException(500, 'Internal Server Error'),
+    RateLimited('Too Many Requests', 1.5),
+    CircuitOpen(3.0),
+    DownloadError('https://cdn.waifu.im/1.png', 'timeout'),
+    InvalidQuery('limit', -1, 'expected a positive integer'),
+    HarvestError({'maid': 'APIException: 403: Forbidden'}),
+])
+def test_exceptions_pickle(error):
+    copy = pickle.loads(pickle.dumps(error))
+    assert type(copy) is type(error)
+    assert str(copy) == str(error)
+    assert copy.__dict__ == error.__dict__
+
+
+def test_every_image_is_exported(tmp_path, serve_in_thread):
+    api = MockAPI(catalog_size=3000)
+    path = str(tmp_path / 'catalog.jsonl')
+    harvester = Harvester(path, token='token', processes=2, base_url=serve_in_thread(api))
+    assert harvester.run() == 3000
+    with open(path, 'r', encoding='utf-8') as f:
+        assert sorted(json.loads(line)['image_id'] for line in f) == list(range(1, 3001))
+
+
+def test_harvest_needs_a_token(tmp_path):
+    with pytest.raises(NoToken):
+        Harvester(str(tmp_path / 'catalog.jsonl'), tags=['waifu'])
+
+
+def test_failing_partition(tmp_path, serve_in_thread):
+    path = str(tmp_path / 'catalog.jsonl')
+    harvester = Harvester(path, token='token', query=Query(is_nsfw='null'), tags=['waifu', 'maid'],
+                          orientations=[None], gifs=[None], processes=2,
+                          base_url=serve_in_thread(FailingAPI(catalog_size=300)))
+    with pytest.raises(HarvestError) as info:
+        harvester.run()
+    failed, completed = Partition('maid', None, None).key, Partition('waifu', None, None).key
+    assert list(info.value.failures) == [failed]
+    assert info.value.failures[failed].startswith('APIException: 403')
+    with open(harvester.checkpoint_path, 'r', encoding='utf-8') as f:
+        assert list(json.load(f)['completed']) == [completed]
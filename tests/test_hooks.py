@@ -0,0 +1,30 @@
+import asyncio
+
+from mock_server import MockAPI
+from waifuim import EventHook, WaifuAioClient
+
+
+class Recorder(EventHook):
+    def __init__(self):
+        self.events = []
+
+    def on_request_start(self, method, url, endpoint):
+        self.events.append(('start', endpoint))
+
+    def on_request_end(self, method, url, endpoint, status, duration, size):
+        self.events.append(('end', endpoint, status))
+
+
+def test_hook_added_during_a_request(serve):
+    async def main():
+        async with serve(MockAPI(catalog_size=100, latency=0.05)) as url, WaifuAioClient(base_url=url) as client:
+            recorder = Recorder()
+            request = asyncio.ensure_future(client.tags(raw=True))
+            await asyncio.sleep(0.01)
+            client.add_hook(recorder)
+            assert 'versatile' in await request
+            assert recorder.events == []
+            await client.tags(raw=True, use_cache=False)
+            assert recorder.events == [('start', 'tags'), ('end', 'tags', 200)]
+
+    asyncio.run(main())
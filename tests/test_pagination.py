@@ -0,0 +1,61 @@
+import asyncio
+import warnings
+
+import pytest
+
+from mock_server import MockAPI
+from waifuim import WaifuAioClient
+
+
+def test_iter_fav_single_request(serve):
+    async def main():
+        api = MockAPI(catalog_size=3000)
+        api.favorites = set(range(1, 3001))
+        async with serve(api) as url, WaifuAioClient(base_url=url, token='token') as client:
+            api.requests = 0
+            ids = [image.image_id async for image in client.iter_fav(lazy=True)]
+        assert sorted(ids) == list(range(1, 3001))
+        assert api.requests == 1
+
+    asyncio.run(main())
+
+
+def test_iter_search_bounded_exclusions(serve):
+    async def main():
+        api = MockAPI(catalog_size=3000, seed=0)
+        async with serve(api) as url, WaifuAioClient(base_url=url, token='token') as client:
+            # A 400 (url too long) or any other error would raise here.
+            with pytest.warns(RuntimeWarning, match='some matching images may be missing'):
+                ids = [
+                    image.image_id async for image in
+                    client.iter_search(page_size=100, exclusion_window=200, lazy=True)
+                ]
+        assert len(ids) == len(set(ids))
+        assert len(ids) > 2500
+
+    asyncio.run(main())
+
+
+def test_iter_search_ends_on_not_found(serve):
+    # Fewer images than the window, they are all excluded in the end and the API answers with a 404.
+    async def main():
+        async with serve(MockAPI(catalog_size=150, seed=0)) as url, WaifuAioClient(base_url=url) as client:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                ids = [image.image_id async for image in client.iter_search(page_size=30, lazy=True)]
+        assert sorted(ids) == list(range(1, 151))
+
+    asyncio.run(main())
+
+
+def test_iter_search_max_images_and_excluded_files(serve):
+    async def main():
+        async with serve(MockAPI(catalog_size=3000, seed=0)) as url, WaifuAioClient(base_url=url) as client:
+            ids = [
+                image.image_id async for image in
+                client.iter_search(page_size=30, max_images=500, excluded_files=[1, 2], lazy=True)
+            ]
+        assert len(ids) == len(set(ids)) == 500
+        assert not {1, 2} & set(ids)
+
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from mock_server import MockAPI
+from waifuim import APIException, ImagePrefetcher, WaifuAioClient
+
+
+def test_small_tag_does_not_run_dry(serve):
+    # 'selfies' only matches 10 images of a 60 images catalog, fewer than the high watermark.
+    async def main():
+        async with serve(MockAPI(catalog_size=60)) as url, WaifuAioClient(base_url=url) as client:
+            async with ImagePrefetcher(client, low_watermark=5, high_watermark=30) as prefetcher:
+                ids = [(await prefetcher.get(included_tags=['selfies'], is_nsfw='null')).image_id for _ in range(40)]
+        assert len(ids) == 40
+        assert set(ids) == {image_id for image_id in range(1, 61) if image_id % 6 == 3}
+
+    asyncio.run(main())
+
+
+def test_no_match_raises_not_found(serve):
+    async def main():
+        api = MockAPI(catalog_size=60)
+        async with serve(api) as url, WaifuAioClient(base_url=url) as client:
+            async with ImagePrefetcher(client) as prefetcher:
+                with pytest.raises(APIException) as info:
+                    await prefetcher.get(included_tags=['unknown'])
+                assert info.value.status == 404
+                # The refill stops on the first 404 instead of hammering the API.
+                assert api.requests <= 3
+
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+import pytest
+
+from waifuim import InvalidQuery, Query
+from waifuim.utils import make_request_key
+
+
+def test_normalization():
+    query = Query(included_tags=['Maid', ' maid', 'waifu'], excluded_files=['3', 3, 4])
+    assert query.included_tags == ('maid', 'waifu')
+    assert query.excluded_files == (3, 4)
+    assert query == Query(included_tags=['maid', 'waifu'], excluded_files=[3, 4])
+
+
+def test_invalid_tag():
+    with pytest.raises(InvalidQuery):
+        Query(included_tags=['maid', ''])
+
+
+def test_many_excluded_files():
+    query = Query(excluded_files=range(20000))
+    assert len(query.excluded_files) == 20000
+
+
+def test_params_key_matches_request_key():
+    query = Query(included_tags=['waifu', 'maid'], excluded_files=[2, 1])
+    params = {'excluded_files': [1, 2], 'included_tags': ['maid', 'waifu']}
+    assert query.params_key == make_request_key('search', params)[1]
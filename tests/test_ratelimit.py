@@ -0,0 +1,34 @@
+import asyncio
+
+from waifuim import RateLimiter
+
+
+def test_token_limit_shared_by_the_endpoints():
+    limiter = RateLimiter(rate=10, endpoint_limits={'fav': (2, 5)}, token_limits={'tenant': (1, 1)})
+    assert limiter.bucket('search', 'tenant') is limiter.bucket('fav', 'tenant')
+    assert limiter.bucket('search', 'tenant').rate == 1
+    assert limiter.bucket('search', 'other') is not limiter.bucket('fav', 'other')
+    assert limiter.bucket('fav', 'other').rate == 2
+    assert limiter.bucket('search', 'tenant').try_acquire()
+    assert not limiter.bucket('fav', 'tenant').try_acquire()
+
+
+def test_idle_buckets_are_dropped():
+    limiter = RateLimiter(rate=10, max_buckets=10)
+    busy = limiter.bucket('search', 'busy')
+    busy.block(60)
+    for i in range(1000):
+        limiter.bucket('search', f'token-{i}')
+    assert len(limiter._buckets) <= 20
+    assert limiter.bucket('search', 'busy') is busy
+
+
+def test_bucket_acquire():
+    async def main():
+        limiter = RateLimiter(rate=1000, burst=1)
+        bucket = limiter.bucket('search')
+        await bucket.acquire()
+        await bucket.acquire()
+        assert not bucket.is_idle()
+
+    asyncio.run(main())
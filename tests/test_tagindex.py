@@ -0,0 +1,20 @@
+import asyncio
+
+import pytest
+
+from mock_server import MockAPI
+from waifuim import UnknownTag, WaifuAioClient
+
+
+def test_single_tag_string(serve):
+    async def main():
+        async with serve(MockAPI(catalog_size=100)) as url:
+            async with WaifuAioClient(base_url=url, tag_validation='reject') as client:
+                await client.load_tag_index()
+                image = await client.search(included_tags='maid', is_nsfw='null')
+                assert 'maid' in [tag.name for tag in image.tags]
+                with pytest.raises(UnknownTag) as info:
+                    await client.search(included_tags='mad')
+                assert info.value.name == 'mad'
+
+    asyncio.run(main())
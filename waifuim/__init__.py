@@ -20,7 +20,79 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 
-from .aioclient import WaifuAioClient
+import importlib
+from types import ModuleType as _ModuleType
+from typing import TYPE_CHECKING
+
+# Light modules, importable without aiohttp or dateutil.
 from .exceptions import *
-from .utils import requires_token, APIBaseURL
 from .moduleinfo import __version__, __author__
+from .query import Query
+from .types import Artist, BatchResult, Image, LazyImage, Tag
+from .utils import requires_token, APIBaseURL
+
+# Everything that needs aiohttp (or is only useful with the client) is imported on first attribute access.
+_LAZY_ATTRIBUTES = {
+    'WaifuAioClient': 'aioclient',
+    'WaifuClient': 'client',
+    'CacheBackend': 'cache',
+    'MemoryBackend': 'cache',
+    'RedisBackend': 'cache',
+    'ResponseCache': 'cache',
+    'ImageCache': 'diskcache',
+    'ImageStore': 'engine',
+    'DownloadStats': 'download',
+    'DirectorySnapshotStore': 'gallery',
+    'GalleryDelta': 'gallery',
+    'GallerySync': 'gallery',
+    'MemorySnapshotStore': 'gallery',
+    'SnapshotStore': 'gallery',
+    'EventHook': 'hooks',
+    'Harvester': 'harvest',
+    'OpenTelemetryExporter': 'metrics',
+    'PrometheusExporter': 'metrics',
+    'ImagePrefetcher': 'prefetch',
+    'RateLimiter': 'ratelimit',
+    'CircuitBreaker': 'retry',
+    'RetryPolicy': 'retry',
+    'TagIndex': 'tagindex',
+    'Tenant': 'tenant',
+    'TenantPool': 'tenant',
+    'TransportConfig': 'transport',
+}
+
+if TYPE_CHECKING:
+    from .aioclient import WaifuAioClient
+    from .client import WaifuClient
+    from .cache import CacheBackend, MemoryBackend, RedisBackend, ResponseCache
+    from .diskcache import ImageCache
+    from .engine import ImageStore
+    from .download import DownloadStats
+    from .gallery import DirectorySnapshotStore, GalleryDelta, GallerySync, MemorySnapshotStore, SnapshotStore
+    from .harvest import Harvester
+    from .hooks import EventHook
+    from .metrics import OpenTelemetryExporter, PrometheusExporter
+    from .prefetch import ImagePrefetcher
+    from .ratelimit import RateLimiter
+    from .retry import CircuitBreaker, RetryPolicy
+    from .tagindex import TagIndex
+    from .tenant import Tenant, TenantPool
+    from .transport import TransportConfig
+
+__all__ = [
+    name for name, value in globals().items()
+    if not name.startswith('_') and not isinstance(value, _ModuleType) and name != 'TYPE_CHECKING'
+] + list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -20,9 +20,22 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 
+import asyncio
 import contextlib
+import inspect
+import os
+import shutil
+import time
+import warnings
+from collections import deque
+from urllib.parse import urlsplit
 from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
     Dict,
+    Iterable,
     List,
     Optional,
     Type,
@@ -31,11 +44,57 @@ from typing import (
 
 import aiohttp
 
+from .cache import ResponseCache, _copy
+from .diskcache import ImageCache
+from .download import DownloadStats, image_filename
 from .exceptions import APIException
+from .exceptions import CircuitOpen
+from .exceptions import DownloadError
 from .exceptions import NoToken
+from .exceptions import RateLimited
+from .exceptions import WaifuException
+from .hooks import EventHook
 from .moduleinfo import __version__
-from .types import Image, Tag
-from .utils import APIBaseURL, requires_token, API_VERSION
+from .query import Query
+from .ratelimit import RateLimiter, TokenBucket, parse_retry_after
+from .retry import CircuitBreaker, RetryPolicy
+from .tagindex import TagIndex
+from .transport import ACCEPT_ENCODING, TransportConfig
+from .types import BatchResult, Image, LazyImage, Tag
+from .utils import APIBaseURL, requires_token, API_VERSION, JSONLoads, get_default_json_loads, make_request_key
+
+# Returned by _do_request for a 304 response to a conditional request.
+_NOT_MODIFIED = object()
+
+
+def _read_validators(headers, validators: Dict) -> None:
+    etag = headers.get('ETag')
+    if etag:
+        validators['etag'] = etag
+    last_modified = headers.get('Last-Modified')
+    if last_modified:
+        validators['last_modified'] = last_modified
+
+
+def _resolve_copy(waiter: asyncio.Future, task: asyncio.Future) -> None:
+    if waiter.done():  # the caller was cancelled
+        return
+    if task.cancelled():
+        waiter.cancel()
+    elif task.exception() is not None:
+        waiter.set_exception(task.exception())
+    else:
+        waiter.set_result(_copy(task.result()))
+
+
+def _conditional_headers(validators: Dict) -> Dict:
+    headers = {}
+    if 'etag' in validators:
+        headers['If-None-Match'] = validators['etag']
+    if 'last_modified' in validators:
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
 
 class WaifuAioClient(contextlib.AbstractAsyncContextManager):
     def __init__(
@@ -43,17 +102,66 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             session: aiohttp.ClientSession = None,
             token: Optional[str] = None,
             app_name: str = f'aiohttp/{aiohttp.__version__}; waifuim.py/{__version__}',
+            cache: Optional[ResponseCache] = None,
+            coalesce: bool = True,
+            rate_limiter: Optional[RateLimiter] = None,
+            retry_policy: Optional[RetryPolicy] = None,
+            circuit_breaker: Optional[CircuitBreaker] = None,
+            base_url: str = APIBaseURL,
+            transport: Optional[TransportConfig] = None,
+            lazy: bool = False,
+            json_loads: Optional[JSONLoads] = None,
+            image_cache: Optional[ImageCache] = None,
+            tag_validation: Optional[str] = None,
+            hooks: Optional[Iterable[EventHook]] = None,
     ) -> None:
         """Asynchronous wrapper client for waifu.im API.
         This class is used to interact with the API (http requests).
         Attributes:
-            session: An aiohttp session.
+            session: An aiohttp session, it is not closed by the client since it is owned by the caller.
             token: your API token.(its optional since you only use it for the private gallery endpoint /fav/)
             app_name: the name of your app in the user agent (please use it its easier to identify you in the logs).
+            cache: An optional ResponseCache used to serve repeated GET requests without sending them.
+            coalesce: If True concurrent identical GET requests share a single HTTP request.
+            rate_limiter: An optional RateLimiter, requests exceeding the limits are queued instead of failing.
+            retry_policy: An optional RetryPolicy used to retry the GET requests failing with a transient error.
+            circuit_breaker: An optional CircuitBreaker that makes requests fail fast while the API is down.
+            base_url: The API base url (e.g. a local server for testing purposes), must end with a slash.
+            transport: The connection pool and timeouts settings of the session created by the client (ignored if a
+            session is provided).
+            lazy: If True search and fav return LazyImage instances, the tags, the artist and the upload date are only
+            built when accessed.
+            json_loads: The function used to decode the responses, defaults to orjson or ujson if installed.
+            image_cache: An optional ImageCache, downloaded images are copied from it instead of fetched when cached.
+            tag_validation: Once the tag index is loaded (see load_tag_index), 'reject' makes search and fav raise
+            UnknownTag for unknown tags before sending anything, 'correct' also replaces misspelled tags by the closest
+            one. None disables the validation.
+            hooks: The EventHook instances receiving the client events (timings, retries, cache hits...).
         """
         self.session = session
         self.token = token
         self.app_name = app_name
+        self.cache = cache
+        self.coalesce = coalesce
+        self.coalesced_requests = 0
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._revalidating: Dict[tuple, asyncio.Future] = {}
+        self._closed = False
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.retry_count = 0
+        self.base_url = base_url
+        self.transport = transport or TransportConfig()
+        self._owns_session = session is None
+        self.lazy = lazy
+        self.json_loads = json_loads or get_default_json_loads()
+        self.download_stats = DownloadStats()
+        self.image_cache = image_cache
+        self.tag_validation = tag_validation
+        self.tag_index: Optional[TagIndex] = None
+        self._tag_index_task: Optional[asyncio.Future] = None
+        self._hooks: List[EventHook] = list(hooks or [])
 
     async def __aexit__(
             self,
@@ -75,7 +183,7 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
         for k, i in kwargs.items():
             if isinstance(i, (list, tuple, set)):
                 rt.update({k: list(i)})
-            elif isinstance(i, Image):
+            elif isinstance(i, (Image, LazyImage)):
                 rt.update({k: i.image_id})
             elif i or isinstance(i, int):
                 if isinstance(i, bool):
@@ -88,35 +196,442 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             return rt
 
     async def close(self) -> None:
-        """Closes the aiohttp session (call it when you're sure you won't do any request anymore)."""
-        if self.session is not None:
+        """Closes the aiohttp session created by the client (call it when you're sure you won't do any request anymore).
+        The background refreshes of stale cached responses are cancelled, a session passed to the constructor is left
+        open and the index of the image cache (if any) is saved. No request can be made afterwards.
+        """
+        self._closed = True
+        if self._tag_index_task is not None:
+            self._tag_index_task.cancel()
+            self._tag_index_task = None
+        revalidations = list(self._revalidating.values())
+        for task in revalidations:
+            task.cancel()
+        if revalidations:
+            await asyncio.gather(*revalidations, return_exceptions=True)
+        if self.session is not None and self._owns_session:
             await self.session.close()
+            self.session = None
+        if self.image_cache is not None:
+            self.image_cache.flush()
+
+    def _check_tags(self, tags: Union[str, List[str], None]) -> Union[str, List[str], None]:
+        if not tags or self.tag_validation is None or self.tag_index is None:
+            return tags
+        if isinstance(tags, str):  # a single tag, as Query accepts
+            tags = [tags]
+        return self.tag_index.resolve(tags, correct=self.tag_validation == 'correct')
+
+    def _check_query(self, query: Query) -> Query:
+        if self.tag_validation is None or self.tag_index is None:
+            return query
+        included_tags = self._check_tags(list(query.included_tags))
+        excluded_tags = self._check_tags(list(query.excluded_tags))
+        if tuple(included_tags) != query.included_tags or tuple(excluded_tags) != query.excluded_tags:
+            query = query.replace(included_tags=included_tags, excluded_tags=excluded_tags)
+        return query
+
+    def _build_image(self, data: Dict, lazy: Optional[bool] = None) -> Union[Image, LazyImage]:
+        if lazy if lazy is not None else self.lazy:
+            return LazyImage(data)
+        return Image(data)
+
+    async def _paginate(
+            self,
+            fetch_page: Callable[[List], Awaitable[List[Dict]]],
+            excluded_files: Iterable,
+            buffer_size: int,
+            max_images: Optional[int],
+            lazy: Optional[bool],
+            exclusion_window: Optional[int] = None,
+            patience: int = 1,
+    ) -> AsyncIterator[Union[Image, LazyImage]]:
+        """Yields the images returned by successive calls to fetch_page(excluded).
+        The next pages are fetched in the background until buffer_size images are waiting to be consumed. excluded is
+        excluded_files followed by the ids of the last exclusion_window images yielded, so that the query string stays
+        bounded, the images yielded earlier are only filtered out locally. exclusion_window=None fetches a single page.
+        The iteration ends on a 404 or after patience pages in a row without any new image, the latter emits a
+        RuntimeWarning when exclusion_window is set since some images may not have been returned.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        end = object()
+
+        async def produce():
+            try:
+                base_excluded = list(excluded_files)
+                seen = set(base_excluded)
+                window = deque(maxlen=exclusion_window or 0)
+                count = 0
+                empty_pages = 0
+                while max_images is None or count < max_images:
+                    try:
+                        page = await fetch_page(base_excluded + list(window))
+                    except APIException as e:
+                        if e.status == 404:  # no image left matching the criteria
+                            break
+                        raise
+                    new = [im for im in page if im['image_id'] not in seen]
+                    if not new:
+                        empty_pages += 1
+                        if empty_pages >= patience:
+                            if exclusion_window is not None:
+                                warnings.warn(
+                                    f'The iteration stopped after {count} images because the API only returned images '
+                                    f'already yielded, some matching images may be missing. Raise exclusion_window or '
+                                    f'use a full search to get all of them.',
+                                    RuntimeWarning,
+                                )
+                            break
+                        continue
+                    empty_pages = 0
+                    if max_images is not None:
+                        new = new[:max_images - count]
+                    for im in new:
+                        seen.add(im['image_id'])
+                        window.append(im['image_id'])
+                    count += len(new)
+                    for im in new:
+                        await queue.put(self._build_image(im, lazy))
+                    if exclusion_window is None:
+                        break
+                await queue.put(end)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is end:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            producer.cancel()
+
+    def _build_images(self, data: List[Dict], lazy: Optional[bool] = None) -> List[Union[Image, LazyImage]]:
+        if not self._hooks:
+            return [self._build_image(im, lazy) for im in data]
+        started_at = time.perf_counter()
+        images = [self._build_image(im, lazy) for im in data]
+        self._emit('on_images_built', len(images), time.perf_counter() - started_at)
+        return images
+
+    def add_hook(self, hook: EventHook) -> None:
+        """Registers an EventHook, see hooks.py for the list of events."""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: EventHook) -> None:
+        """Unregisters an EventHook."""
+        self._hooks.remove(hook)
+
+    def _emit(self, event: str, *args) -> None:
+        for hook in self._hooks:
+            getattr(hook, event)(*args)
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        """Returns an aiohttp TraceConfig reporting the DNS resolution, connection and time to first byte timings to
+        the client hooks. It is used automatically by the session created by the client when hooks are registered.
+        """
+        async def on_request_start(session, context, params):
+            context.request_start = time.perf_counter()
+
+        async def on_request_end(session, context, params):
+            self._emit('on_first_byte', params.method, str(params.url), time.perf_counter() - context.request_start)
+
+        async def on_dns_resolvehost_start(session, context, params):
+            context.dns_start = time.perf_counter()
+
+        async def on_dns_resolvehost_end(session, context, params):
+            self._emit('on_dns_resolved', params.host, time.perf_counter() - context.dns_start)
+
+        async def on_connection_create_start(session, context, params):
+            context.connection_start = time.perf_counter()
+
+        async def on_connection_create_end(session, context, params):
+            self._emit('on_connection_created', time.perf_counter() - context.connection_start)
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        return trace_config
 
     async def _get_session(self) -> aiohttp.ClientSession:
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        if self._closed:
+            # Otherwise a request still running (e.g. a background refresh) would open a session nobody closes.
+            raise RuntimeError('the client is closed')
+        if self.session is None or (self._owns_session and self.session.closed):
+            # Tracing has a cost, the trace config is only added if someone listens.
+            trace_configs = [self.create_trace_config()] if self._hooks else None
+            self.session = self.transport.create_session(trace_configs=trace_configs)
+            self._owns_session = True
         return self.session
 
     async def _make_request(
             self,
             url: str,
             method: str,
+            use_cache: bool = True,
+            **kwargs,
+    ) -> Optional[Dict]:
+        method = method.upper()
+        endpoint = url[len(self.base_url):] if url.startswith(self.base_url) else urlsplit(url).path.strip('/')
+        provided_headers = kwargs.pop("headers", None)
+        params_key = kwargs.pop("params_key", None)
+
+        if method != 'GET':
+            infos = await self._send_request(url, method, endpoint, provided_headers, **kwargs)
+            if self.cache is not None and endpoint.startswith('fav'):
+                await self.cache.invalidate('fav')
+            return infos
+
+        if params_key is not None:  # precomputed by a Query
+            key = (endpoint, params_key, provided_headers.get('Authorization') if provided_headers else None)
+        else:
+            key = make_request_key(endpoint, kwargs.get('params'), provided_headers)
+        cache_key = None
+        ttl = None
+        if use_cache and self.cache is not None:
+            ttl = self.cache.ttl_for(endpoint)
+            if ttl:
+                cache_key = self.cache.make_key(key)
+                cached = await self.cache.get(cache_key)
+                if cached is None:
+                    if self._hooks:
+                        self._emit('on_cache_miss', endpoint)
+                else:
+                    infos, fresh = cached
+                    if self._hooks:
+                        self._emit('on_cache_hit', endpoint, fresh)
+                    if not fresh and key not in self._revalidating and not self._closed:
+                        # Serve the stale response and refresh it in the background.
+                        task = asyncio.ensure_future(
+                            self._fetch(key, cache_key, ttl, url, method, endpoint, provided_headers, **kwargs))
+                        self._revalidating[key] = task
+                        task.add_done_callback(lambda t: self._forget_revalidation(key, t))
+                    return infos
+
+        return await self._fetch(key, cache_key, ttl, url, method, endpoint, provided_headers, **kwargs)
+
+    async def _fetch(
+            self,
+            key: tuple,
+            cache_key: Optional[str],
+            ttl: Optional[float],
+            url: str,
+            method: str,
+            endpoint: str,
+            provided_headers: Optional[Dict],
+            **kwargs,
+    ) -> Optional[Dict]:
+        if not self.coalesce:
+            return await self._fetch_and_store(cache_key, ttl, url, method, endpoint, provided_headers, **kwargs)
+
+        # Concurrent identical requests await the same task, shielded so that a cancelled caller
+        # does not cancel the request for everyone else.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._fetch_and_store(cache_key, ttl, url, method, endpoint, provided_headers, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget_inflight(key, t))
+            return await asyncio.shield(task)
+
+        self.coalesced_requests += 1
+        if self._hooks:
+            self._emit('on_coalesced', endpoint)
+        # The other callers get their own copy of the response, made in a done callback so that it runs before the
+        # first caller resumes and possibly mutates its response (e.g. one returned with raw=True).
+        waiter = asyncio.get_running_loop().create_future()
+        task.add_done_callback(lambda t: _resolve_copy(waiter, t))
+        return await waiter
+
+    async def _fetch_and_store(
+            self,
+            cache_key: Optional[str],
+            ttl: Optional[float],
+            url: str,
+            method: str,
+            endpoint: str,
+            provided_headers: Optional[Dict],
+            **kwargs,
+    ) -> Optional[Dict]:
+        if cache_key is None:
+            return await self._send_request(url, method, endpoint, provided_headers, **kwargs)
+
+        # An expired entry with validators is revalidated with a conditional request.
+        headers = provided_headers
+        cached_validators = await self.cache.get_validators(cache_key)
+        if cached_validators:
+            headers = {**(provided_headers or {}), **_conditional_headers(cached_validators)}
+        validators = {}
+        infos = await self._send_request(url, method, endpoint, headers, validators=validators, **kwargs)
+        if infos is _NOT_MODIFIED:
+            infos = await self.cache.refresh(cache_key, ttl)
+            if infos is not None:
+                return infos
+            # The entry was evicted in the meantime.
+            infos = await self._send_request(url, method, endpoint, provided_headers, validators=validators, **kwargs)
+        if infos is not None:
+            await self.cache.set(cache_key, infos, ttl, validators)
+        return infos
+
+    def _forget_revalidation(self, key: tuple, task: asyncio.Future) -> None:
+        self._revalidating.pop(key, None)
+        # A failed refresh is not an error, the stale response is served until the entry expires.
+        if not task.cancelled():
+            task.exception()
+
+    def _forget_inflight(self, key: tuple, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # Mark the exception as retrieved in case every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    async def _send_request(
+            self,
+            url: str,
+            method: str,
+            endpoint: str,
+            provided_headers: Optional[Dict] = None,
             **kwargs,
     ) -> Optional[Dict]:
         session = await self._get_session()
 
-        headers = {'User-Agent': self.app_name, 'Accept-Version': API_VERSION}
-        provided_headers = kwargs.pop("headers", None)
+        headers = {'User-Agent': self.app_name, 'Accept-Version': API_VERSION, 'Accept-Encoding': ACCEPT_ENCODING}
         if provided_headers:
             headers = {**headers, **provided_headers}
-        async with session.request(method.upper(), url, headers=headers, **kwargs) as response:
-            if response.status == 204:  # old but can still be useful in the future
-                return
-            infos = await response.json()
-            if response.status in {200, 201}:
-                return infos
+
+        policy = self.retry_policy if method == 'GET' else None
+        breaker = self.circuit_breaker
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpen(breaker.retry_in())
+            attempt += 1
+            try:
+                infos = await self._send_limited(session, method, url, endpoint, headers, **kwargs)
+            except asyncio.CancelledError:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            except (APIException, asyncio.TimeoutError, aiohttp.ClientError) as e:
+                transient = not isinstance(e, APIException) or e.status >= 500
+                if breaker is not None:
+                    if transient:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                if (
+                        policy is None
+                        or attempt >= policy.max_attempts
+                        or (isinstance(e, APIException) and e.status not in policy.retry_statuses)
+                ):
+                    raise
+                delay = policy.compute_delay(attempt)
+                if policy.deadline is not None and time.monotonic() - started_at + delay > policy.deadline:
+                    raise
+                self.retry_count += 1
+                if self._hooks:
+                    self._emit('on_retry', endpoint, attempt, delay, e)
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Any other error (an undecodable body, an OSError...) still ends the half open probe.
+                if breaker is not None:
+                    breaker.record_failure()
+                raise
             else:
-                raise APIException(response.status, infos['detail'])
+                if breaker is not None:
+                    breaker.record_success()
+                return infos
+
+    async def _send_limited(
+            self,
+            session: aiohttp.ClientSession,
+            method: str,
+            url: str,
+            endpoint: str,
+            headers: Dict,
+            **kwargs,
+    ) -> Optional[Dict]:
+        limiter = self.rate_limiter
+        if limiter is None:
+            return await self._do_request(session, method, url, endpoint, headers, None, **kwargs)
+
+        auth = headers.get('Authorization')
+        token = auth[len('Bearer '):] if auth and auth.startswith('Bearer ') else None
+        bucket = limiter.bucket(endpoint, token)
+        retries = 0
+        while True:
+            await bucket.acquire()
+            try:
+                async with limiter.semaphore:
+                    return await self._do_request(session, method, url, endpoint, headers, bucket, **kwargs)
+            except RateLimited as e:
+                if retries >= limiter.max_retries:
+                    raise
+                retries += 1
+                bucket.block(e.retry_after if e.retry_after is not None else limiter.default_backoff * retries)
+
+    async def _do_request(
+            self,
+            session: aiohttp.ClientSession,
+            method: str,
+            url: str,
+            endpoint: str,
+            headers: Dict,
+            bucket: Optional[TokenBucket],
+            validators: Optional[Dict] = None,
+            **kwargs,
+    ) -> Optional[Dict]:
+        hooks = bool(self._hooks)  # a hook added while the request runs only sees the next ones
+        if hooks:
+            started_at = time.perf_counter()
+            self._emit('on_request_start', method, url, endpoint)
+        try:
+            async with session.request(method, url, headers=headers, **kwargs) as response:
+                if bucket is not None:
+                    retry_after = parse_retry_after(response.headers)
+                    if retry_after:
+                        bucket.block(retry_after)
+                status = response.status
+                if validators is not None and status == 200:
+                    _read_validators(response.headers, validators)
+                body = await response.read() if status not in (204, 304) else b''
+        except Exception as e:
+            if hooks:
+                self._emit('on_request_error', method, url, endpoint, e, time.perf_counter() - started_at)
+            raise
+        if hooks:
+            self._emit('on_request_end', method, url, endpoint, status, time.perf_counter() - started_at, len(body))
+
+        if status == 204:  # old but can still be useful in the future
+            return
+        if status == 304 and validators is not None:  # the cached response is still valid, nothing to decode
+            return _NOT_MODIFIED
+        if status == 429:  # the body is not guaranteed to be json
+            raise RateLimited(response.reason or 'Too Many Requests', parse_retry_after(response.headers))
+        if status in {200, 201}:
+            return self._decode(endpoint, body)
+        try:
+            infos = self._decode(endpoint, body)
+        except ValueError:  # e.g. an html error page from a proxy
+            raise APIException(status, response.reason) from None
+        raise APIException(status, infos['detail'])
+
+    def _decode(self, endpoint: str, body: bytes) -> Dict:
+        if not self._hooks:
+            return self.json_loads(body)
+        started_at = time.perf_counter()
+        infos = self.json_loads(body)
+        self._emit('on_json_decoded', endpoint, time.perf_counter() - started_at, len(body))
+        return infos
 
     async def search(
             self,
@@ -135,6 +650,9 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             full: str = None,
             token: str = None,
             raw: bool = False,
+            use_cache: bool = True,
+            lazy: bool = None,
+            query: Query = None,
     ) -> Union[List[Image], Image, Dict]:
         """Gets a single or multiple images from the API.
         Kwargs:
@@ -153,25 +671,35 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             if nothing (or None) is provided then no filter is applied.
             full: Do not limit the result length (only for admins)
             raw : If True return the raw result.
+            use_cache: If False the client cache (if any) is bypassed for this request.
+            lazy: If True return LazyImage instances, defaults to the lazy attribute of the client.
+            query: A prebuilt Query, the filters kwargs are ignored if provided.
         Returns:
             A single or a list of Image (find it in types.py).
         Raises:
             APIException: If the API response contains an error.
+            UnknownTag: If a tag is unknown according to the tag index (see tag_validation).
         """
-        params = self._create_params(included_tags=included_tags,
-                                     excluded_tags=excluded_tags,
-                                     included_files=included_files,
-                                     excluded_files=excluded_files,
-                                     is_nsfw=is_nsfw,
-                                     limit=limit,
-                                     order_by=order_by,
-                                     orientation=orientation,
-                                     width=width,
-                                     height=height,
-                                     byte_size=byte_size,
-                                     gif=gif,
-                                     full=full
-                                     )
+        if query is not None:
+            query = self._check_query(query)
+            params, params_key = query.query_string, query.params_key
+            limit, full = query.limit, query.full
+        else:
+            params_key = None
+            params = self._create_params(included_tags=self._check_tags(included_tags),
+                                         excluded_tags=self._check_tags(excluded_tags),
+                                         included_files=included_files,
+                                         excluded_files=excluded_files,
+                                         is_nsfw=is_nsfw,
+                                         limit=limit,
+                                         order_by=order_by,
+                                         orientation=orientation,
+                                         width=width,
+                                         height=height,
+                                         byte_size=byte_size,
+                                         gif=gif,
+                                         full=full
+                                         )
         headers = {}
 
         if not token and not self.token:
@@ -182,14 +710,84 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
                                      "token")
         else:
             headers.update({'Authorization': f'Bearer {token if token else self.token}'})
-        infos = await self._make_request(f"{APIBaseURL}search", 'get', params=params, headers=headers)
+        infos = await self._make_request(f"{self.base_url}search", 'get', use_cache=use_cache, params=params,
+                                         params_key=params_key, headers=headers)
         if raw:
             return infos
-        images = [Image(im) for im in infos['images']]
+        images = self._build_images(infos['images'], lazy)
         if len(images) > 1:
             return images
         return images[0]
 
+    async def iter_search(
+            self,
+            included_tags: List[str] = None,
+            excluded_tags: List[str] = None,
+            included_files: List[str] = None,
+            excluded_files: List[str] = None,
+            is_nsfw: Union[bool, str] = None,
+            order_by: str = None,
+            orientation: str = None,
+            width: str = None,
+            height: str = None,
+            byte_size: str = None,
+            gif: bool = None,
+            page_size: int = 30,
+            max_images: int = None,
+            buffer_size: int = 60,
+            token: str = None,
+            lazy: bool = None,
+            query: Query = None,
+            exclusion_window: int = 200,
+    ) -> AsyncIterator[Union[Image, LazyImage]]:
+        """Iterates over the images matching the criteria, page by page.
+        The next pages are prefetched while the current one is consumed and the same image is never yielded twice.
+        Only the ids of the last exclusion_window images yielded are excluded from the following requests (the URL
+        would otherwise grow with every page until the server rejects it), the older ones are filtered out locally.
+        So this is not an exhaustive iterator: with the default random order the iteration ends once a few pages in a
+        row only bring images already yielded, usually missing a few percent of the images when there are more than
+        exclusion_window of them. With a deterministic order_by the images older than the window come back first once
+        it slides, so such an iteration ends after about exclusion_window + page_size images. In both cases a
+        RuntimeWarning is emitted, raise the window or use a full search to get every image.
+        Kwargs:
+            page_size: The number of images requested at once (greater than 30 is only accessible to admins).
+            max_images: Stop after yielding this number of images, if None iterates until the API has no image left or
+            only returns images already yielded (see above).
+            buffer_size: The maximum number of images fetched in advance.
+            exclusion_window: The number of already yielded image ids sent back to the API with each request.
+            lazy: If True yield LazyImage instances, defaults to the lazy attribute of the client.
+            query: A prebuilt Query, the filters kwargs are ignored if provided.
+            The other kwargs are the same as search.
+        Yields:
+            Image (or LazyImage) instances.
+        Raises:
+            APIException: If the API response contains an error.
+            InvalidQuery: If a filter is not valid.
+        """
+        if query is None:
+            query = Query(included_tags=included_tags,
+                          excluded_tags=excluded_tags,
+                          included_files=included_files,
+                          excluded_files=excluded_files,
+                          is_nsfw=is_nsfw,
+                          order_by=order_by,
+                          orientation=orientation,
+                          width=width,
+                          height=height,
+                          byte_size=byte_size,
+                          gif=gif,
+                          )
+        async def fetch_page(excluded):
+            page_query = query.replace(excluded_files=excluded, limit=page_size)
+            infos = await self.search(query=page_query, token=token, raw=True, use_cache=False)
+            return infos['images']
+
+        # A random page may only contain images yielded before the window, a few of them in a row mean the end.
+        patience = 3 if query.order_by in (None, 'RANDOM') else 1
+        async for image in self._paginate(fetch_page, query.excluded_files, buffer_size, max_images, lazy,
+                                          exclusion_window, patience):
+            yield image
+
     @requires_token
     async def fav(
             self,
@@ -207,8 +805,11 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             gif: bool = None,
             token: str = None,
             raw: bool = False,
+            use_cache: bool = True,
+            lazy: bool = None,
+            query: Query = None,
     ) -> Union[List[Image], Dict]:
-        """Get your favourite gallery.""
+        """Get your favourite gallery.
 
         Kwargs:
             user_id: The user's id you want to access the gallery (only for trusted apps).
@@ -227,30 +828,98 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             if nothing (or None) is provided then no filter is applied.
             token: The token that will be use for this request only, this doesn't change the token passed in __init__.
             raw : If True return the raw result.
+            use_cache: If False the client cache (if any) is bypassed for this request.
+            lazy: If True return LazyImage instances, defaults to the lazy attribute of the client.
+            query: A prebuilt Query, the filters kwargs are ignored if provided.
         Returns:
             A dictionary containing the json the API returned.
         Raises:
             APIException: If the API response contains an error.
+            UnknownTag: If a tag is unknown according to the tag index (see tag_validation).
         """
-        params = self._create_params(user_id=user_id,
-                                     included_tags=included_tags,
-                                     excluded_tags=excluded_tags,
-                                     included_files=included_files,
-                                     excluded_files=excluded_files,
-                                     is_nsfw=is_nsfw,
-                                     order_by=order_by,
-                                     orientation=orientation,
-                                     width=width,
-                                     height=height,
-                                     byte_size=byte_size,
-                                     gif=gif,
-                                     )
+        params_key = None
+        if query is not None:
+            query = self._check_query(query)
+            if user_id is None:
+                params, params_key = query.query_string, query.params_key
+            else:
+                params = {**query.params, 'user_id': int(user_id)}
+        else:
+            params = self._create_params(user_id=user_id,
+                                         included_tags=self._check_tags(included_tags),
+                                         excluded_tags=self._check_tags(excluded_tags),
+                                         included_files=included_files,
+                                         excluded_files=excluded_files,
+                                         is_nsfw=is_nsfw,
+                                         order_by=order_by,
+                                         orientation=orientation,
+                                         width=width,
+                                         height=height,
+                                         byte_size=byte_size,
+                                         gif=gif,
+                                         )
         headers = self._create_headers(**{'Authorization': f'Bearer {token if token else self.token}'})
 
-        infos = await self._make_request(f"{APIBaseURL}fav", 'get', params=params, headers=headers)
+        infos = await self._make_request(f"{self.base_url}fav", 'get', use_cache=use_cache, params=params,
+                                         params_key=params_key, headers=headers)
         if raw:
             return infos
-        return [Image(im) for im in infos['images']]
+        return self._build_images(infos['images'], lazy)
+
+    @requires_token
+    async def iter_fav(
+            self,
+            user_id: int = None,
+            included_tags: List[str] = None,
+            excluded_tags: List[str] = None,
+            included_files: List[str] = None,
+            excluded_files: List[str] = None,
+            is_nsfw: Union[bool, str] = None,
+            order_by: str = None,
+            orientation: str = None,
+            width: str = None,
+            height: str = None,
+            byte_size: str = None,
+            gif: bool = None,
+            max_images: int = None,
+            buffer_size: int = 60,
+            token: str = None,
+            lazy: bool = None,
+            query: Query = None,
+    ) -> AsyncIterator[Union[Image, LazyImage]]:
+        """Iterates over a user favourite gallery.
+        The API returns the whole gallery in a single response, so a single request is sent.
+        Kwargs:
+            max_images: Stop after yielding this number of images, if None iterates over the whole gallery.
+            buffer_size: The maximum number of images built in advance.
+            lazy: If True yield LazyImage instances, defaults to the lazy attribute of the client.
+            query: A prebuilt Query, the filters kwargs are ignored if provided.
+            The other kwargs are the same as fav.
+        Yields:
+            Image (or LazyImage) instances.
+        Raises:
+            APIException: If the API response contains an error.
+            InvalidQuery: If a filter is not valid.
+        """
+        if query is None:
+            query = Query(included_tags=included_tags,
+                          excluded_tags=excluded_tags,
+                          included_files=included_files,
+                          excluded_files=excluded_files,
+                          is_nsfw=is_nsfw,
+                          order_by=order_by,
+                          orientation=orientation,
+                          width=width,
+                          height=height,
+                          byte_size=byte_size,
+                          gif=gif,
+                          )
+        async def fetch_page(excluded):
+            infos = await self.fav(user_id=user_id, token=token, raw=True, use_cache=False, query=query)
+            return infos['images']
+
+        async for image in self._paginate(fetch_page, query.excluded_files, buffer_size, max_images, lazy):
+            yield image
 
     @requires_token
     async def fav_delete(
@@ -271,12 +940,8 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
         Raises:
             APIException: If the API response contains an error.
         """
-        params = self._create_params(
-            user_id=int(user_id) if user_id is not None else None,
-            image_id=image_id,
-        )
         headers = self._create_headers(**{'Authorization': f'Bearer {token if token else self.token}'})
-        return await self._make_request(f"{APIBaseURL}fav/delete", 'post', json=params, headers=headers)
+        return await self._fav_mutation('delete', image_id, user_id, headers)
 
     @requires_token
     async def fav_insert(
@@ -296,12 +961,8 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
         Raises:
             APIException: If the API response contains an error.
         """
-        params = self._create_params(
-            user_id=int(user_id) if user_id is not None else None,
-            image_id=image_id,
-        )
         headers = self._create_headers(**{'Authorization': f'Bearer {token if token else self.token}'})
-        return await self._make_request(f"{APIBaseURL}fav/insert", 'post', json=params, headers=headers)
+        return await self._fav_mutation('insert', image_id, user_id, headers)
 
     @requires_token
     async def fav_toggle(
@@ -320,13 +981,132 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
         Raises:
             APIException: If the API response contains an error.
         """
+        headers = self._create_headers(
+            **{'User-Agent': self.app_name, 'Authorization': f'Bearer {token if token else self.token}'})
+        return await self._fav_mutation('toggle', image_id, user_id, headers)
+
+    async def _fav_mutation(
+            self,
+            action: str,
+            image_id: Union[int, Image, LazyImage],
+            user_id: Optional[int],
+            headers: Dict,
+    ) -> Dict:
         params = self._create_params(
             user_id=int(user_id) if user_id is not None else None,
             image_id=image_id,
         )
-        headers = self._create_headers(
-            **{'User-Agent': self.app_name, 'Authorization': f'Bearer {token if token else self.token}'})
-        return await self._make_request(f"{APIBaseURL}fav/toggle", 'post', json=params, headers=headers)
+        return await self._make_request(f"{self.base_url}fav/{action}", 'post', json=params, headers=headers)
+
+    async def _fav_many(
+            self,
+            action: str,
+            images: Iterable[Union[int, Image, LazyImage]],
+            user_id: Optional[int],
+            token: Optional[str],
+            concurrency: int,
+            on_progress: Optional[Callable[[int, int, BatchResult], Any]],
+    ) -> List[BatchResult]:
+        headers = self._create_headers(**{'Authorization': f'Bearer {token if token else self.token}'})
+        return await self._run_batch(
+            images,
+            lambda image: self._fav_mutation(action, image, user_id, headers),
+            concurrency,
+            on_progress,
+        )
+
+    @staticmethod
+    async def _run_batch(
+            items: Iterable,
+            func: Callable[[Any], Awaitable],
+            concurrency: int,
+            on_progress: Optional[Callable[[int, int, BatchResult], Any]],
+    ) -> List[BatchResult]:
+        semaphore = asyncio.Semaphore(concurrency)
+        results = [BatchResult(item) for item in items]
+        done = 0
+
+        async def run(result):
+            nonlocal done
+            async with semaphore:
+                try:
+                    result.result = await func(result.item)
+                except Exception as e:
+                    result.error = e
+            done += 1
+            if on_progress is not None:
+                ret = on_progress(done, len(results), result)
+                if inspect.isawaitable(ret):
+                    await ret
+
+        await asyncio.gather(*(run(result) for result in results))
+        return results
+
+    @requires_token
+    async def fav_insert_many(
+            self,
+            images: Iterable[Union[int, Image]],
+            user_id: int = None,
+            token: str = None,
+            concurrency: int = 5,
+            on_progress: Callable[[int, int, BatchResult], Any] = None,
+    ) -> List[BatchResult]:
+        """Add several images to the user favorites, a failing image does not stop the others.
+        Args:
+            images: The images (or their ids) that you want to add to the gallery.
+        Kwargs:
+            user_id: The user's id you want to access the gallery (only for trusted apps).
+            token: The token that will be use for these requests only, this doesn't change the token passed in __init__.
+            concurrency: The maximum number of requests running at the same time.
+            on_progress: A function (or coroutine function) called with (done, total, result) after each image.
+        Returns:
+            A list of BatchResult, in the same order as images.
+        """
+        return await self._fav_many('insert', images, user_id, token, concurrency, on_progress)
+
+    @requires_token
+    async def fav_delete_many(
+            self,
+            images: Iterable[Union[int, Image]],
+            user_id: int = None,
+            token: str = None,
+            concurrency: int = 5,
+            on_progress: Callable[[int, int, BatchResult], Any] = None,
+    ) -> List[BatchResult]:
+        """Remove several images from the user favorites, a failing image does not stop the others.
+        Args:
+            images: The images (or their ids) that you want to remove from the gallery.
+        Kwargs:
+            user_id: The user's id you want to access the gallery (only for trusted apps).
+            token: The token that will be use for these requests only, this doesn't change the token passed in __init__.
+            concurrency: The maximum number of requests running at the same time.
+            on_progress: A function (or coroutine function) called with (done, total, result) after each image.
+        Returns:
+            A list of BatchResult, in the same order as images.
+        """
+        return await self._fav_many('delete', images, user_id, token, concurrency, on_progress)
+
+    @requires_token
+    async def fav_toggle_many(
+            self,
+            images: Iterable[Union[int, Image]],
+            user_id: int = None,
+            token: str = None,
+            concurrency: int = 5,
+            on_progress: Callable[[int, int, BatchResult], Any] = None,
+    ) -> List[BatchResult]:
+        """Toggle several images in the user favorites, a failing image does not stop the others.
+        Args:
+            images: The images (or their ids) that you want to toggle.
+        Kwargs:
+            user_id: The user's id you want to access the gallery (only for trusted apps).
+            token: The token that will be use for these requests only, this doesn't change the token passed in __init__.
+            concurrency: The maximum number of requests running at the same time.
+            on_progress: A function (or coroutine function) called with (done, total, result) after each image.
+        Returns:
+            A list of BatchResult, in the same order as images, the result attribute being 'INSERTED' or 'DELETED'.
+        """
+        return await self._fav_many('toggle', images, user_id, token, concurrency, on_progress)
 
     @requires_token
     async def report(
@@ -350,25 +1130,155 @@ class WaifuAioClient(contextlib.AbstractAsyncContextManager):
             user_id=int(user_id) if user_id is not None else None,
         )
         headers = self._create_headers(**{'Authorization': f'Bearer {self.token}'})
-        return await self._make_request(f"{APIBaseURL}report", 'post', json=params, headers=headers)
+        return await self._make_request(f"{self.base_url}report", 'post', json=params, headers=headers)
 
-    async def tags(self, full=False, raw=False) -> Union[dict, list[Tag]]:
+    async def tags(self, full=False, raw=False, use_cache=True) -> Union[dict, list[Tag]]:
         """Gets the API endpoints, same as endpoints method but returns a list of Tag (see types.py).
         Returns:
             A list of Tag.
         Kwargs:
             full: returns detailed information on the tag
             raw: returns the raw data from the api
+            use_cache: If False the client cache (if any) is bypassed for this request.
         Raises:
             APIException: If the API response contains an error.
 
         """
         params = self._create_params(full=full)
-        results = await self._make_request(APIBaseURL + f'tags', 'get', params=params)
+        results = await self._make_request(f"{self.base_url}tags", 'get', use_cache=use_cache, params=params)
         if not full or raw:
             return results
         tags = []
         for k, v in results.items():
             for tag_infos in v:
-                tags.append(Tag(tag_infos))
+                tags.append(Tag.from_data(tag_infos))
         return tags
+
+    async def load_tag_index(self, refresh_interval: Optional[float] = None) -> TagIndex:
+        """Fetches the tags and builds the tag index used to look them up and to validate the tags passed to search and
+        fav (see tag_validation).
+        Kwargs:
+            refresh_interval: If provided the index is fetched again in the background every refresh_interval seconds.
+        Returns:
+            The TagIndex, also available as the tag_index attribute.
+        Raises:
+            APIException: If the API response contains an error.
+        """
+        self.tag_index = TagIndex.from_response(await self.tags(full=True, raw=True, use_cache=False))
+        if self._tag_index_task is not None:
+            self._tag_index_task.cancel()
+            self._tag_index_task = None
+        if refresh_interval:
+            self._tag_index_task = asyncio.ensure_future(self._refresh_tag_index(refresh_interval))
+        return self.tag_index
+
+    async def _refresh_tag_index(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.tag_index = TagIndex.from_response(await self.tags(full=True, raw=True, use_cache=False))
+            except (WaifuException, asyncio.TimeoutError, aiohttp.ClientError):
+                pass  # keep the current index until the next refresh
+
+    async def download(
+            self,
+            image: Union[Image, LazyImage, str],
+            dest: Union[str, os.PathLike] = '.',
+            chunk_size: int = 64 * 1024,
+            resume: bool = True,
+    ) -> str:
+        """Downloads an image, streaming it to the disk chunk by chunk (or copying it from the image cache if any).
+        The data is written to a .part file renamed once the download is complete, if such a file already exists the
+        download resumes where it stopped using a Range request.
+        Args:
+            image: The image (or its url) to download.
+        Kwargs:
+            dest: The file path, or the directory in which the image is saved as <image_id><extension>.
+            chunk_size: The size of the chunks written to the disk.
+            resume: If False a partially downloaded file is downloaded again from the start.
+        Returns:
+            The path of the downloaded file.
+        Raises:
+            DownloadError: If the download failed or if the file size does not match the image byte_size.
+        """
+        url = image if isinstance(image, str) else image.url
+        expected_size = None if isinstance(image, str) else image.byte_size
+        path = os.fspath(dest)
+        if os.path.isdir(path):
+            path = os.path.join(path, image_filename(image))
+        part_path = path + '.part'
+
+        cache = self.image_cache if not isinstance(image, str) else None
+        if cache is not None:
+            cached_path = cache.get_path(image)
+            if cached_path is not None:
+                try:
+                    await asyncio.get_event_loop().run_in_executor(None, shutil.copyfile, cached_path, path)
+                    return path
+                except FileNotFoundError:  # evicted in the meantime
+                    pass
+
+        self.download_stats.start()
+        succeeded = False
+        try:
+            offset = os.path.getsize(part_path) if resume and os.path.exists(part_path) else 0
+            if expected_size is not None and offset > expected_size:
+                offset = 0
+            if expected_size is None or offset < expected_size:
+                headers = {'User-Agent': self.app_name}
+                if offset:
+                    headers['Range'] = f'bytes={offset}-'
+                session = await self._get_session()
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 206:
+                        mode = 'ab'
+                    elif response.status == 200:
+                        mode, offset = 'wb', 0
+                    else:
+                        raise DownloadError(url, f'unexpected status code {response.status}')
+                    with open(part_path, mode) as f:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            f.write(chunk)
+                            offset += len(chunk)
+                            self.download_stats.bytes += len(chunk)
+            if expected_size is not None and offset != expected_size:
+                os.remove(part_path)
+                raise DownloadError(url, f'expected {expected_size} bytes but got {offset}')
+            os.replace(part_path, path)
+            if cache is not None:
+                await cache.put_async(image, path)
+            succeeded = True
+            return path
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise DownloadError(url, str(e) or type(e).__name__) from e
+        finally:
+            self.download_stats.stop(succeeded)
+
+    async def download_many(
+            self,
+            images: Iterable[Union[Image, LazyImage, str]],
+            directory: Union[str, os.PathLike] = '.',
+            concurrency: int = 4,
+            chunk_size: int = 64 * 1024,
+            resume: bool = True,
+            on_progress: Callable[[int, int, BatchResult], Any] = None,
+    ) -> List[BatchResult]:
+        """Downloads several images in a directory, a failing image does not stop the others.
+        Args:
+            images: The images (or their urls) to download.
+        Kwargs:
+            directory: The directory in which the images are saved as <image_id><extension>, created if needed.
+            concurrency: The maximum number of downloads running at the same time.
+            chunk_size: The size of the chunks written to the disk.
+            resume: If False partially downloaded files are downloaded again from the start.
+            on_progress: A function (or coroutine function) called with (done, total, result) after each image.
+        Returns:
+            A list of BatchResult, in the same order as images, the result attribute being the file path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        return await self._run_batch(
+            images,
+            lambda image: self.download(image, directory, chunk_size=chunk_size, resume=resume),
+            concurrency,
+            on_progress,
+        )
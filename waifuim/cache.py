@@ -0,0 +1,271 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import fnmatch
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+DEFAULT_ENDPOINT_TTLS = {
+    'tags': 3600.0,
+    'search': 60.0,
+    'fav': 30.0,
+}
+
+
+class CacheBackend:
+    """The interface of the storages used by ResponseCache.
+    An entry is a dictionary made of json compatible values, keys are strings of the form '<endpoint>|<auth>|<params>'.
+    """
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Returns the entry stored under key, None if there is none or if it expired."""
+        raise NotImplementedError
+
+    async def set(self, key: str, entry: Dict, ttl: float) -> None:
+        """Stores an entry for ttl seconds."""
+        raise NotImplementedError
+
+    async def delete_matching(self, pattern: str) -> None:
+        """Removes every entry whose key matches the glob style pattern."""
+        raise NotImplementedError
+
+
+def _copy(value: Any) -> Any:
+    # A deep copy of json compatible values, much faster than copy.deepcopy.
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, maxsize: int = 1024) -> None:
+        """A size bounded in-memory LRU storage.
+        The entries are not serialized but copied when stored and when read, so that a caller mutating a response (e.g.
+        one returned with raw=True) does not alter the cached one.
+        Attributes:
+            maxsize: The maximum number of entries, the least recently used is evicted first.
+        """
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[str, Tuple[float, Dict]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        expires_at, entry = item
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return _copy(entry)
+
+    async def set(self, key: str, entry: Dict, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, _copy(entry))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def delete_matching(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            del self._entries[key]
+
+
+def _json_dumps(entry: Dict) -> bytes:
+    return json.dumps(entry, separators=(',', ':')).encode()
+
+
+def _get_serializers():
+    # Returns the format written (its marker and dumps function) and the loads function of each readable format.
+    loads = {b'j': json.loads}
+    try:
+        import msgpack
+    except ImportError:
+        return b'j', _json_dumps, loads
+    loads[b'm'] = msgpack.unpackb
+    return b'm', msgpack.packb, loads
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, redis, prefix: str = 'waifuim:') -> None:
+        """A storage shared between processes and hosts, backed by a Redis server.
+        The entries are serialized with msgpack if installed, else with compact json, and start with a marker of their
+        format. So hosts with and without msgpack can share a server: an entry that can not be decoded is a cache miss.
+        Attributes:
+            redis: An asynchronous Redis client such as redis.asyncio.Redis (or fakeredis.aioredis.FakeRedis).
+            prefix: The prefix of the keys written to Redis.
+        """
+        self.redis = redis
+        self.prefix = prefix
+        self._format, self._dumps, self._loads = _get_serializers()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        data = await self.redis.get(self.prefix + key)
+        if data is None:
+            return None
+        loads = self._loads.get(data[:1])
+        if loads is None:
+            return None  # written in a format this host can not read, e.g. msgpack while it is not installed
+        try:
+            return loads(data[1:])
+        except (ValueError, TypeError):
+            return None
+
+    async def set(self, key: str, entry: Dict, ttl: float) -> None:
+        await self.redis.set(self.prefix + key, self._format + self._dumps(entry), px=max(int(ttl * 1000), 1))
+
+    async def delete_matching(self, pattern: str) -> None:
+        keys = [key async for key in self.redis.scan_iter(match=self.prefix + pattern)]
+        if keys:
+            await self.redis.delete(*keys)
+
+
+def _hash(value: Any) -> str:
+    return hashlib.sha1(repr(value).encode()).hexdigest()[:20]
+
+
+class ResponseCache:
+    def __init__(
+            self,
+            maxsize: int = 1024,
+            ttl: Optional[float] = 60.0,
+            endpoint_ttls: Optional[Dict[str, Optional[float]]] = None,
+            backend: Optional[CacheBackend] = None,
+            stale_ttl: float = 0.0,
+            revalidate_ttl: float = 600.0,
+    ) -> None:
+        """A cache for the API responses.
+        Only GET requests are cached, the key is built from the endpoint, the normalized params and the token used.
+        Attributes:
+            maxsize: The maximum number of responses kept in memory when no backend is provided.
+            ttl: The time to live (in seconds) of the responses of the endpoints without their own in DEFAULT_ENDPOINT_TTLS.
+            None or 0 disables the caching of every endpoint not listed in endpoint_ttls, the defaults included.
+            endpoint_ttls: Per endpoint time to live (e.g. {'tags': 3600, 'search': 0}), overrides the default ttl.
+            backend: Where the responses are stored, defaults to a MemoryBackend of maxsize entries. Use a RedisBackend
+            to share the responses between several processes.
+            stale_ttl: For how long (in seconds) an expired response is still served while it is refreshed in the
+            background (stale-while-revalidate), 0 disables it.
+            revalidate_ttl: For how long (in seconds) an expired response having an ETag or a Last-Modified header is
+            kept to be revalidated with a conditional request, a 304 response refreshes it without any body to decode.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.endpoint_ttls = {**(DEFAULT_ENDPOINT_TTLS if ttl else {}), **(endpoint_ttls or {})}
+        self.backend = backend if backend is not None else MemoryBackend(maxsize)
+        self.stale_ttl = stale_ttl
+        self.revalidate_ttl = revalidate_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def ttl_for(self, endpoint: str) -> Optional[float]:
+        """Returns the time to live of the given endpoint, None if its responses should not be cached."""
+        return self.endpoint_ttls.get(endpoint, self.ttl) or None
+
+    @staticmethod
+    def make_key(request_key: tuple) -> str:
+        """Converts a key built by utils.make_request_key to a backend key, the token is hashed."""
+        endpoint, params, auth = request_key
+        return f'{endpoint}|{_hash(auth) if auth else "-"}|{_hash(params)}'
+
+    async def get(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """Returns the cached response and whether it is still fresh, None if there is no usable entry for this key."""
+        entry = await self.backend.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        age = time.time() - entry['stored_at']
+        if age < entry['ttl']:
+            self.hits += 1
+            return entry['value'], True
+        if age < entry['ttl'] + self.stale_ttl:
+            self.hits += 1
+            self.stale_hits += 1
+            return entry['value'], False
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: float, validators: Optional[Dict[str, str]] = None) -> None:
+        """Stores a response, fresh for ttl seconds (then stale for stale_ttl seconds).
+        Args:
+            validators: The 'etag' and/or 'last_modified' headers of the response, used to revalidate it once expired.
+        """
+        entry = {'value': value, 'stored_at': time.time(), 'ttl': ttl}
+        if validators:
+            entry.update(validators)
+        await self.backend.set(key, entry, self._backend_ttl(entry))
+
+    def _backend_ttl(self, entry: Dict) -> float:
+        if 'etag' in entry or 'last_modified' in entry:
+            return entry['ttl'] + max(self.stale_ttl, self.revalidate_ttl)
+        return entry['ttl'] + self.stale_ttl
+
+    async def get_validators(self, key: str) -> Optional[Dict[str, str]]:
+        """Returns the validators ('etag' and/or 'last_modified') of the entry stored under key, None if there are none."""
+        entry = await self.backend.get(key)
+        if entry is None:
+            return None
+        validators = {name: entry[name] for name in ('etag', 'last_modified') if name in entry}
+        return validators or None
+
+    async def refresh(self, key: str, ttl: float) -> Optional[Any]:
+        """Marks the entry stored under key as fresh again after a 304 response and returns its value, None if the entry
+        is gone in the meantime.
+        """
+        entry = await self.backend.get(key)
+        if entry is None:
+            return None
+        entry = {**entry, 'stored_at': time.time(), 'ttl': ttl}
+        await self.backend.set(key, entry, self._backend_ttl(entry))
+        self.revalidations += 1
+        return entry['value']
+
+    async def invalidate(self, endpoint: Optional[str] = None, token: Optional[str] = None) -> None:
+        """Removes every entry of the given endpoint and/or token, or the whole cache if none is provided."""
+        auth = _hash(f'Bearer {token}') if token is not None else '*'
+        await self.backend.delete_matching(f'{endpoint if endpoint is not None else "*"}|{auth}|*')
+
+    async def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        await self.invalidate()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
@@ -0,0 +1,146 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+import threading
+from typing import (
+    Any,
+    AsyncIterator,
+    Coroutine,
+    Iterator,
+    Optional,
+    Type,
+)
+
+from .aioclient import WaifuAioClient
+
+
+def _blocking(name: str):
+    coroutine_function = getattr(WaifuAioClient, name)
+
+    def method(self, *args, **kwargs):
+        return self._run(getattr(self._client, name)(*args, **kwargs))
+
+    method.__name__ = name
+    method.__qualname__ = f'WaifuClient.{name}'
+    method.__doc__ = coroutine_function.__doc__
+    return method
+
+
+def _blocking_iterator(name: str):
+    async_generator_function = getattr(WaifuAioClient, name)
+
+    def method(self, *args, **kwargs):
+        return self._iterate(getattr(self._client, name)(*args, **kwargs))
+
+    method.__name__ = name
+    method.__qualname__ = f'WaifuClient.{name}'
+    method.__doc__ = async_generator_function.__doc__
+    return method
+
+
+class WaifuClient:
+    def __init__(self, token: Optional[str] = None, **kwargs) -> None:
+        """Synchronous wrapper client for waifu.im API, it can be used from several threads at once.
+        The requests are made by a WaifuAioClient running in a background event loop thread, so every thread shares
+        the same connection pool. The methods are the same as WaifuAioClient ones but block until the result is there.
+        Attributes:
+            token: your API token.(its optional since you only use it for the private gallery endpoint /fav/)
+            The other kwargs are passed to WaifuAioClient, except session since the session has to be created in the
+            background event loop (use transport to configure it).
+        """
+        if kwargs.get('session') is not None:
+            raise TypeError('WaifuClient creates its own session, use the transport kwarg to configure it')
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='waifuim-client', daemon=True)
+        self._thread.start()
+        self._client = WaifuAioClient(token=token, **kwargs)
+        self._closed = False
+
+    def __enter__(self) -> 'WaifuClient':
+        return self
+
+    def __exit__(
+            self,
+            exception_type: Type[Exception],
+            exception: Exception,
+            exception_traceback,
+    ) -> None:
+        self.close()
+
+    @property
+    def aio_client(self) -> WaifuAioClient:
+        """The underlying WaifuAioClient, only use it from the background event loop."""
+        return self._client
+
+    @property
+    def token(self) -> Optional[str]:
+        return self._client.token
+
+    @token.setter
+    def token(self, value: Optional[str]) -> None:
+        self._client.token = value
+
+    def _run(self, coroutine: Coroutine) -> Any:
+        if self._closed:
+            coroutine.close()
+            raise RuntimeError('the client is closed')
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def _iterate(self, iterator: AsyncIterator) -> Iterator:
+        try:
+            while True:
+                try:
+                    yield self._run(iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self._closed:
+                self._run(iterator.aclose())
+
+    def close(self) -> None:
+        """Closes the session and stops the background event loop (call it when you're sure you won't do any request
+        anymore).
+        """
+        if self._closed:
+            return
+        self._run(self._client.close())
+        self._closed = True
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    search = _blocking('search')
+    iter_search = _blocking_iterator('iter_search')
+    fav = _blocking('fav')
+    iter_fav = _blocking_iterator('iter_fav')
+    fav_insert = _blocking('fav_insert')
+    fav_delete = _blocking('fav_delete')
+    fav_toggle = _blocking('fav_toggle')
+    fav_insert_many = _blocking('fav_insert_many')
+    fav_delete_many = _blocking('fav_delete_many')
+    fav_toggle_many = _blocking('fav_toggle_many')
+    report = _blocking('report')
+    tags = _blocking('tags')
+    load_tag_index = _blocking('load_tag_index')
+    download = _blocking('download')
+    download_many = _blocking('download_many')
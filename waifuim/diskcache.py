@@ -0,0 +1,205 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+import json
+import mmap
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import (
+    Optional,
+    Union,
+)
+
+from .types import Image, LazyImage
+
+INDEX_VERSION = 1
+
+
+class ImageCache:
+    def __init__(
+            self,
+            directory: Union[str, os.PathLike],
+            max_bytes: int = 1024 ** 3,
+            flush_interval: float = 5.0,
+    ) -> None:
+        """A persistent on-disk cache of image files, keyed by the image signature.
+        The least recently used files are evicted once the cache exceeds max_bytes, the index is saved in the cache
+        directory so the cache survives restarts. The index is written at most every flush_interval seconds and by
+        flush()/close(), call close() (or WaifuAioClient.close()) before exiting to save the latest changes.
+        Attributes:
+            directory: The directory where the files and the index are stored, created if needed.
+            max_bytes: The maximum total size of the cached files.
+            flush_interval: The minimum time (in seconds) between two writes of the index by put().
+        """
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._flushed_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.total_bytes = 0
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._dirty = False
+        os.makedirs(os.path.join(self.directory, 'files'), exist_ok=True)
+        self._load_index()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, 'index.json')
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, image: Union[Image, LazyImage]) -> bool:
+        return self._key(image) in self._entries
+
+    @staticmethod
+    def _key(image: Union[Image, LazyImage]) -> str:
+        return image.signature or str(image.image_id)
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.directory, 'files', key)
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        if index.get('version') != INDEX_VERSION:
+            return
+        for key, size in index['entries']:
+            # Files removed behind our back are forgotten.
+            if os.path.exists(self._file_path(key)):
+                self._entries[key] = size
+                self.total_bytes += size
+
+    def flush(self) -> None:
+        """Saves the index to the disk if it changed, the recently used order is only saved by this method and put()."""
+        if not self._dirty:
+            return
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': list(self._entries.items())}, f, separators=(',', ':'))
+        os.replace(tmp_path, self._index_path)
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        """Saves the index, the cache can still be used afterwards."""
+        self.flush()
+
+    def get_path(self, image: Union[Image, LazyImage]) -> Optional[str]:
+        """Returns the path of the cached file of the image, None if it is not cached."""
+        key = self._key(image)
+        size = self._entries.get(key)
+        if size is None:
+            self.misses += 1
+            return None
+        path = self._file_path(key)
+        if not os.path.exists(path):
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._dirty = True
+        self.hits += 1
+        self.bytes_saved += size
+        return path
+
+    def open(self, image: Union[Image, LazyImage]) -> Optional[Union[mmap.mmap, bytes]]:
+        """Returns the content of the cached image as a read-only memory map (no copy is made), None if it is not
+        cached. Close the memory map once you're done with it.
+        """
+        path = self.get_path(image)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:  # empty files can't be mapped
+                return b''
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def put(self, image: Union[Image, LazyImage], source: Union[str, os.PathLike]) -> str:
+        """Copies the file at source in the cache and returns the path of the cached file."""
+        key = self._key(image)
+        size = self._copy_in(key, source)
+        return self._add(key, size)
+
+    async def put_async(self, image: Union[Image, LazyImage], source: Union[str, os.PathLike]) -> str:
+        """Same as put but the file is copied in a thread, so that the event loop is not blocked meanwhile."""
+        key = self._key(image)
+        size = await asyncio.get_event_loop().run_in_executor(None, self._copy_in, key, source)
+        return self._add(key, size)
+
+    def _copy_in(self, key: str, source: Union[str, os.PathLike]) -> int:
+        # Only touches the file, so it can run in another thread.
+        path = self._file_path(key)
+        tmp_path = f'{path}.{os.getpid()}.{id(source)}.tmp'
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, path)
+        return os.path.getsize(path)
+
+    def _add(self, key: str, size: int) -> str:
+        self._remove(key)
+        self._entries[key] = size
+        self.total_bytes += size
+        self._evict()
+        self._dirty = True
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return self._file_path(key)
+
+    def _remove(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+            self._dirty = True
+
+    def _evict(self) -> None:
+        while self.total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(self._file_path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """Removes every cached file."""
+        for key in list(self._entries):
+            try:
+                os.remove(self._file_path(key))
+            except FileNotFoundError:
+                pass
+        self._entries.clear()
+        self.total_bytes = 0
+        self._dirty = True
+        self.flush()
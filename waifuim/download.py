@@ -0,0 +1,77 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import os
+import time
+from typing import (
+    Union,
+)
+from urllib.parse import urlsplit
+
+from .types import Image, LazyImage
+
+
+def image_filename(image: Union[Image, LazyImage, str]) -> str:
+    """Returns the file name an image is saved as, its id followed by its extension."""
+    if isinstance(image, str):
+        return os.path.basename(urlsplit(image).path)
+    if image.image_id is not None and image.extension:
+        return f'{image.image_id}{image.extension}'
+    return os.path.basename(urlsplit(image.url).path)
+
+
+class DownloadStats:
+    def __init__(self) -> None:
+        """Throughput counters of the downloads made by a client.
+        Attributes:
+            files: The number of files downloaded.
+            failures: The number of downloads that failed.
+            bytes: The number of bytes received.
+            busy_time: The time (in seconds) during which at least one download was running.
+        """
+        self.files = 0
+        self.failures = 0
+        self.bytes = 0
+        self.busy_time = 0.0
+        self._active = 0
+        self._busy_since = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        busy_time = self.busy_time
+        if self._active:
+            busy_time += time.monotonic() - self._busy_since
+        return self.bytes / busy_time if busy_time else 0.0
+
+    def start(self) -> None:
+        if not self._active:
+            self._busy_since = time.monotonic()
+        self._active += 1
+
+    def stop(self, succeeded: bool) -> None:
+        self._active -= 1
+        if not self._active:
+            self.busy_time += time.monotonic() - self._busy_since
+        if succeeded:
+            self.files += 1
+        else:
+            self.failures += 1
@@ -0,0 +1,289 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import operator
+import random
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .exceptions import InvalidQuery
+from .query import Query, parse_filter
+from .types import Image, LazyImage, parse_datetime
+
+_COMPARATORS: Dict[str, Callable] = {
+    '<=': operator.le,
+    '>=': operator.ge,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '=': operator.eq,
+}
+
+_NUMERIC_COLUMNS = ('width', 'height', 'byte_size', 'favorites', 'uploaded_at', 'liked_at')
+
+# The API orderings (most first) and the columns they sort on.
+_API_ORDERINGS = {'FAVORITES': 'favorites', 'UPLOADED_AT': 'uploaded_at', 'LIKED_AT': 'liked_at'}
+
+_ORDERINGS = frozenset(_NUMERIC_COLUMNS + ('pixels',))
+
+
+def _timestamp(value) -> Optional[float]:
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    return value.timestamp() if value is not None else None
+
+
+class ImageStore:
+    """An in-memory columnar store of images metadata, answering search like queries locally.
+
+    Each column is kept as a list indexed by row and every predicate (a tag, 'width>=2000', gif=True...) is evaluated
+    once into a bitset (an int whose bit i is set when row i matches), cached until the store changes. A query is then a
+    few bitwise operations on those ints, which Python runs word by word, followed by a walk of the pre-sorted rows of
+    the requested ordering until limit matching rows are found.
+    """
+
+    def __init__(self, images: Iterable[Union[Image, LazyImage, Dict]] = ()) -> None:
+        """Initializes the store.
+        Attributes:
+            images: The images to add to the store (see add).
+        """
+        self._images: List[Union[Image, LazyImage]] = []
+        self._rows: Dict[int, int] = {}
+        self._signatures: Dict[str, int] = {}
+        self._columns: Dict[str, List] = {
+            name: [] for name in _NUMERIC_COLUMNS + ('pixels', 'is_nsfw', 'gif', 'dominant_color')
+        }
+        self._tags: Dict[str, int] = {}
+        self._row_tags: List[Tuple[str, ...]] = []
+        self._masks: Dict[tuple, int] = {}
+        self._orders: Dict[Tuple[str, bool], List[int]] = {}
+        self.add(images)
+
+    def __len__(self) -> int:
+        return len(self._images)
+
+    def __contains__(self, image: Union[int, Image, LazyImage]) -> bool:
+        return getattr(image, 'image_id', image) in self._rows
+
+    @property
+    def tags(self) -> List[str]:
+        """The names of the tags of the stored images."""
+        return sorted(name for name, mask in self._tags.items() if mask)
+
+    def add(self, images: Union[Image, LazyImage, Dict, Iterable[Union[Image, LazyImage, Dict]]]) -> None:
+        """Adds images (or raw API dictionaries) to the store, an image already stored is replaced.
+        The results of search, fav, iter_search... can be passed as they are.
+        """
+        if isinstance(images, (Image, LazyImage, dict)):
+            images = (images,)
+        for image in images:
+            if isinstance(image, dict):
+                image = LazyImage(image)
+            self._add(image)
+        self._masks.clear()
+        self._orders.clear()
+
+    def _add(self, image: Union[Image, LazyImage]) -> None:
+        row = self._rows.get(image.image_id)
+        if row is None:
+            row = len(self._images)
+            self._rows[image.image_id] = row
+            self._images.append(image)
+            self._row_tags.append(())
+            for column in self._columns.values():
+                column.append(None)
+        else:
+            self._images[row] = image
+        if image.signature:
+            self._signatures[image.signature] = row
+
+        columns = self._columns
+        width, height = image.width, image.height
+        columns['width'][row] = width
+        columns['height'][row] = height
+        columns['pixels'][row] = width * height if width is not None and height is not None else None
+        columns['byte_size'][row] = image.byte_size
+        columns['favorites'][row] = image.favorites
+        columns['uploaded_at'][row] = _timestamp(image.uploaded_at)
+        columns['liked_at'][row] = _timestamp(image.liked_at)
+        columns['is_nsfw'][row] = image.is_nsfw
+        columns['gif'][row] = (image.extension or '').lower() == '.gif'
+        columns['dominant_color'][row] = (image.dominant_color or '').lower() or None
+
+        bit = 1 << row
+        for name in self._row_tags[row]:
+            self._tags[name] &= ~bit
+        if isinstance(image, LazyImage):  # do not build the Tag objects
+            names = tuple(tag['name'].lower() for tag in image.raw.get('tags') or ())
+        else:
+            names = tuple(tag.name.lower() for tag in image.tags)
+        for name in names:
+            self._tags[name] = self._tags.get(name, 0) | bit
+        self._row_tags[row] = names
+
+    def _all(self) -> int:
+        return (1 << len(self._images)) - 1
+
+    def _mask(self, column: str, compare: Callable, value) -> int:
+        key = (column, compare, value)
+        mask = self._masks.get(key)
+        if mask is None:
+            # Built from a string of bits, row 0 being the lowest bit.
+            bits = ''.join('1' if v is not None and compare(v, value) else '0' for v in reversed(self._columns[column]))
+            mask = int(bits, 2) if bits else 0
+            self._masks[key] = mask
+        return mask
+
+    def _files_mask(self, files: Iterable[Union[int, str]]) -> int:
+        mask = 0
+        for file in files:
+            row = self._rows.get(file) if isinstance(file, int) else self._signatures.get(file)
+            if row is not None:
+                mask |= 1 << row
+        return mask
+
+    def _order(self, column: str, ascending: bool) -> List[int]:
+        order = self._orders.get((column, ascending))
+        if order is None:
+            values = self._columns[column]
+            # The rows without a value always come last.
+            with_value = sorted((row for row, v in enumerate(values) if v is not None), key=values.__getitem__,
+                                reverse=not ascending)
+            order = with_value + [row for row, v in enumerate(values) if v is None]
+            self._orders[column, ascending] = order
+        return order
+
+    def match(self, query: Query, dominant_color: Optional[str] = None) -> int:
+        """Returns the bitset of the rows matching the filters of the query, with the same semantics as the API: all the
+        included tags are needed, is_nsfw defaults to False ('null' for any), LANDSCAPE means wider than tall...
+        """
+        mask = self._all()
+        for name in query.included_tags:
+            mask &= self._tags.get(name, 0)
+            if not mask:
+                return 0
+        for name in query.excluded_tags:
+            mask &= ~self._tags.get(name, 0)
+        if query.included_files:
+            mask &= self._files_mask(query.included_files)
+        if query.excluded_files:
+            mask &= ~self._files_mask(query.excluded_files)
+
+        is_nsfw = False if query.is_nsfw is None else query.is_nsfw
+        if is_nsfw != 'null':
+            mask &= self._mask('is_nsfw', operator.eq, is_nsfw)
+        if query.gif is not None:
+            mask &= self._mask('gif', operator.eq, query.gif)
+        if query.orientation == 'LANDSCAPE':
+            mask &= self._orientation_mask(operator.gt)
+        elif query.orientation == 'PORTRAIT':
+            mask &= self._orientation_mask(operator.lt)
+        for column in ('width', 'height', 'byte_size'):
+            expression = getattr(query, column)
+            if expression is not None:
+                op, value = parse_filter(column, expression)
+                mask &= self._mask(column, _COMPARATORS[op], value)
+        if dominant_color is not None:
+            mask &= self._mask('dominant_color', operator.eq, dominant_color.lower())
+        return mask
+
+    def _orientation_mask(self, compare: Callable) -> int:
+        key = ('orientation', compare, None)
+        mask = self._masks.get(key)
+        if mask is None:
+            widths, heights = self._columns['width'], self._columns['height']
+            bits = ''.join(
+                '1' if widths[row] is not None and heights[row] is not None and compare(widths[row], heights[row])
+                else '0'
+                for row in range(len(widths) - 1, -1, -1)
+            )
+            mask = int(bits, 2) if bits else 0
+            self._masks[key] = mask
+        return mask
+
+    def search(
+            self,
+            query: Optional[Query] = None,
+            order_by: Optional[str] = None,
+            ascending: bool = False,
+            limit: Optional[int] = None,
+            dominant_color: Optional[str] = None,
+            **filters,
+    ) -> List[Union[Image, LazyImage]]:
+        """Returns the stored images matching the filters, without any request.
+        Kwargs:
+            query: A prebuilt Query, the filters kwargs are ignored if provided.
+            order_by: One of the API orderings (FAVORITES, UPLOADED_AT, LIKED_AT, RANDOM) or a column (width, height,
+            pixels, byte_size, favorites, uploaded_at, liked_at), defaults to the query one, else the insertion order.
+            ascending: If True the least come first, the orderings are most first by default.
+            limit: The maximum number of images, defaults to the query one, else every matching image.
+            dominant_color: Only keep the images of this dominant color (e.g. '#ffffff').
+            The other kwargs are the same as WaifuAioClient.search ones (width='>=2000', included_tags=[...]...).
+        Returns:
+            A list of the images as they were added (Image or LazyImage).
+        Raises:
+            InvalidQuery: If a filter is not valid.
+        """
+        if query is None:
+            query = Query(**filters)
+        order_by = order_by or query.order_by
+        limit = limit if limit is not None else query.limit
+
+        mask = self.match(query, dominant_color)
+        if not mask or limit == 0:
+            return []
+        bits = bin(mask)[:1:-1]  # bits[row] == '1' if the row matches
+
+        if order_by is None:
+            rows = [row for row, bit in enumerate(bits) if bit == '1']
+            return [self._images[row] for row in rows[:limit]]
+        if order_by.upper() == 'RANDOM':
+            rows = [row for row, bit in enumerate(bits) if bit == '1']
+            rows = random.sample(rows, min(limit, len(rows)) if limit is not None else len(rows))
+            return [self._images[row] for row in rows]
+
+        column = _API_ORDERINGS.get(order_by.upper(), order_by.lower())
+        if column not in _ORDERINGS:
+            raise InvalidQuery('order_by', order_by, f'expected one of RANDOM, {", ".join(sorted(_API_ORDERINGS))}, '
+                                                     f'{", ".join(sorted(_ORDERINGS))}')
+        order = self._order(column, ascending)
+        size = len(bits)
+        images = []
+        for row in order:
+            if row < size and bits[row] == '1':
+                images.append(self._images[row])
+                if limit is not None and len(images) >= limit:
+                    break
+        return images
+
+    def count(self, query: Optional[Query] = None, dominant_color: Optional[str] = None, **filters) -> int:
+        """Returns the number of stored images matching the filters (same kwargs as search)."""
+        if query is None:
+            query = Query(**filters)
+        return bin(self.match(query, dominant_color)).count('1')
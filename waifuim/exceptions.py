@@ -38,6 +38,10 @@ class APIException(WaifuException):
         self.status = status
         self.detail = detail
 
+    def __reduce__(self):
+        # The formatted message alone can not rebuild the exception, e.g. when it is sent back by a pool process.
+        return type(self), (self.status, self.detail)
+
 
 class NoToken(WaifuException):
     """Exception raised when the user try to request the gallery route with no token"""
@@ -46,3 +50,106 @@ class NoToken(WaifuException):
                                'Please pass your token to WaifuAioClient'):
         super().__init__(detail)
         self.detail = detail
+
+
+class RateLimited(APIException):
+    """Exception raised when the API keeps answering with a 429 status code."""
+
+    def __init__(self, detail: str, retry_after: float = None) -> None:
+        """Initializes the RateLimited exception.
+        Args:
+            detail: The response detail.
+            retry_after: How many seconds the API asked to wait before retrying, if it said so.
+        """
+        super().__init__(429, detail)
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        return type(self), (self.detail, self.retry_after)
+
+
+class CircuitOpen(WaifuException):
+    """Exception raised when a request is refused because the circuit breaker is open."""
+
+    def __init__(self, retry_in: float) -> None:
+        """Initializes the CircuitOpen exception.
+        Args:
+            retry_in: How many seconds are left before the breaker lets a request through again.
+        """
+        super().__init__(f'The API looks down, requests are refused for {retry_in:.1f} more seconds.')
+        self.retry_in = retry_in
+
+    def __reduce__(self):
+        return type(self), (self.retry_in,)
+
+
+class DownloadError(WaifuException):
+    """Exception raised when an image could not be downloaded."""
+
+    def __init__(self, url: str, detail: str) -> None:
+        """Initializes the DownloadError.
+        Args:
+            url: The url of the image.
+            detail: Why the download failed.
+        """
+        super().__init__(f'{url}: {detail}')
+        self.url = url
+        self.detail = detail
+
+    def __reduce__(self):
+        return type(self), (self.url, self.detail)
+
+
+class UnknownTag(WaifuException):
+    """Exception raised when a tag passed to search or fav does not exist according to the client tag index."""
+
+    def __init__(self, name: str, suggestions: list = None) -> None:
+        """Initializes the UnknownTag exception.
+        Args:
+            name: The unknown tag name.
+            suggestions: The closest tag names.
+        """
+        detail = f"Unknown tag '{name}'."
+        if suggestions:
+            detail += f" Did you mean {', '.join(repr(s) for s in suggestions)}?"
+        super().__init__(detail)
+        self.name = name
+        self.suggestions = suggestions or []
+
+    def __reduce__(self):
+        return type(self), (self.name, self.suggestions)
+
+
+class InvalidQuery(WaifuException, ValueError):
+    """Exception raised when a search filter is not valid."""
+
+    def __init__(self, name: str, value, detail: str) -> None:
+        """Initializes the InvalidQuery exception.
+        Args:
+            name: The name of the invalid filter.
+            value: The invalid value.
+            detail: What was expected.
+        """
+        super().__init__(f'Invalid {name} {value!r}: {detail}.')
+        self.name = name
+        self.value = value
+        self.detail = detail
+
+    def __reduce__(self):
+        return type(self), (self.name, self.value, self.detail)
+
+
+class HarvestError(WaifuException):
+    """Exception raised when some partitions of a harvest failed, the others are kept in the checkpoint."""
+
+    def __init__(self, failures: dict) -> None:
+        """Initializes the HarvestError exception.
+        Args:
+            failures: The error message of each failed partition, by partition key.
+        """
+        super().__init__(f"{len(failures)} partition(s) failed: {', '.join(sorted(failures))}. "
+                         f"Run the harvest again to resume.")
+        self.failures = failures
+
+    def __reduce__(self):
+        return type(self), (self.failures,)
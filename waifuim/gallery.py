@@ -0,0 +1,204 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from .exceptions import APIException
+from .types import Image, LazyImage
+
+SNAPSHOT_VERSION = 1
+
+# (image_id, signature) couples, most recently liked first.
+Snapshot = List[Tuple[int, str]]
+
+
+class SnapshotStore:
+    """The interface of the storages used by GallerySync to keep the gallery snapshots."""
+
+    async def load(self, key: str) -> Optional[Snapshot]:
+        """Returns the snapshot stored under key, None if there is none."""
+        raise NotImplementedError
+
+    async def save(self, key: str, snapshot: Snapshot) -> None:
+        """Stores the snapshot under key, replacing the previous one."""
+        raise NotImplementedError
+
+
+class MemorySnapshotStore(SnapshotStore):
+    """Keeps the snapshots in memory, they are lost when the process exits."""
+
+    def __init__(self) -> None:
+        self._snapshots: Dict[str, Snapshot] = {}
+
+    async def load(self, key: str) -> Optional[Snapshot]:
+        return self._snapshots.get(key)
+
+    async def save(self, key: str, snapshot: Snapshot) -> None:
+        self._snapshots[key] = list(snapshot)
+
+
+class DirectorySnapshotStore(SnapshotStore):
+    def __init__(self, directory: Union[str, os.PathLike]) -> None:
+        """Keeps each snapshot in a compact json file of the directory, written atomically.
+        Attributes:
+            directory: The directory where the snapshots are stored, created if needed.
+        """
+        self.directory = os.fspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    async def load(self, key: str) -> Optional[Snapshot]:
+        try:
+            with open(self._path(key), 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != SNAPSHOT_VERSION:
+            return None
+        return [(image_id, signature) for image_id, signature in data['images']]
+
+    async def save(self, key: str, snapshot: Snapshot) -> None:
+        path = self._path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'images': snapshot}, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+
+class GalleryDelta:
+    __slots__ = ('key', 'added', 'removed', 'scanned', '_snapshot')
+
+    def __init__(
+            self,
+            key: str,
+            added: List[Union[Image, LazyImage]],
+            removed: List[int],
+            scanned: int,
+            snapshot: Snapshot,
+    ) -> None:
+        """The changes of a gallery since the previous sync.
+        Attributes:
+            key: The snapshot key of the user.
+            added: The images liked since the previous sync (or whose signature changed), most recent first.
+            removed: The ids of the images no longer in the gallery.
+            scanned: The number of gallery entries read from the API.
+        """
+        self.key = key
+        self.added = added
+        self.removed = removed
+        self.scanned = scanned
+        self._snapshot = snapshot
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed)
+
+    def __repr__(self) -> str:
+        return f'<GalleryDelta key={self.key!r} added={len(self.added)} removed={len(self.removed)}>'
+
+
+class GallerySync:
+    def __init__(self, client, store: Optional[SnapshotStore] = None) -> None:
+        """Mirrors users fav galleries, keeping a compact snapshot (image ids and signatures) per user.
+        The API returns the whole gallery in a single response, so each sync costs one request whatever changed; only
+        the entries that are new or whose signature changed are turned into images.
+        Attributes:
+            client: The WaifuAioClient used to list the galleries.
+            store: Where the snapshots are kept, defaults to a MemorySnapshotStore.
+        """
+        self.client = client
+        self.store = store if store is not None else MemorySnapshotStore()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def snapshot_key(self, user_id: Optional[int] = None, token: Optional[str] = None) -> str:
+        """Returns the key of the user snapshot, the user id or a hash of the token (never the token itself)."""
+        if user_id is not None:
+            return f'user-{int(user_id)}'
+        token = token or self.client.token
+        return 'token-' + hashlib.sha1(str(token).encode()).hexdigest()[:20]
+
+    async def sync(
+            self,
+            user_id: Optional[int] = None,
+            token: Optional[str] = None,
+            commit: bool = True,
+    ) -> GalleryDelta:
+        """Lists the gallery and returns what changed since the previous sync.
+        Kwargs:
+            user_id: The user whose gallery is synced, defaults to the token owner.
+            token: The token used for the request, defaults to the client one.
+            commit: If False the snapshot is only updated by commit(delta), e.g. once the delta is applied.
+        Returns:
+            A GalleryDelta, whose added images are LazyImage instances.
+        Raises:
+            APIException: If the API response contains an error.
+        """
+        key = self.snapshot_key(user_id, token)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            old = dict(await self.store.load(key) or ())
+            try:
+                infos = await self.client.fav(
+                    user_id=user_id,
+                    order_by='LIKED_AT',
+                    token=token,
+                    raw=True,
+                    use_cache=False,
+                )
+                entries = infos['images']
+            except APIException as e:
+                if e.status != 404:  # 404 means the gallery is empty
+                    raise
+                entries = []
+
+            snapshot: Snapshot = []
+            added = []
+            for data in entries:
+                image_id, signature = data['image_id'], data.get('signature')
+                snapshot.append((image_id, signature))
+                if old.pop(image_id, None) != signature:
+                    added.append(LazyImage(data))
+            # What is left of the previous snapshot was not listed anymore.
+            removed = list(old)
+            delta = GalleryDelta(key, added, removed, len(entries), snapshot)
+            if commit:
+                await self.store.save(key, snapshot)
+            return delta
+
+    async def commit(self, delta: GalleryDelta) -> None:
+        """Saves the snapshot of a delta returned by sync(commit=False)."""
+        await self.store.save(delta.key, delta._snapshot)
+
+    async def reset(self, user_id: Optional[int] = None, token: Optional[str] = None) -> None:
+        """Forgets the user snapshot, the next sync reports the whole gallery as added."""
+        await self.store.save(self.snapshot_key(user_id, token), [])
@@ -0,0 +1,441 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+)
+
+from .exceptions import APIException, HarvestError, InvalidQuery, NoToken, WaifuException
+from .query import Query
+from .utils import APIBaseURL
+
+CHECKPOINT_VERSION = 2  # 1 accepted partitions paged with iter_search, which may miss images
+ORIENTATIONS = ('LANDSCAPE', 'PORTRAIT')
+GIFS = (False, True)
+
+PARQUET_COLUMNS = (
+    ('image_id', 'int64'),
+    ('signature', 'string'),
+    ('extension', 'string'),
+    ('favorites', 'int64'),
+    ('dominant_color', 'string'),
+    ('source', 'string'),
+    ('uploaded_at', 'string'),
+    ('liked_at', 'string'),
+    ('is_nsfw', 'bool'),
+    ('width', 'int64'),
+    ('height', 'int64'),
+    ('byte_size', 'int64'),
+    ('url', 'string'),
+    ('preview_url', 'string'),
+    ('tags', 'list<string>'),  # the tag names
+    ('artist', 'string'),  # json encoded
+)
+
+
+class Partition(NamedTuple):
+    """A slice of the query space harvested by a single process, None meaning any value."""
+
+    tag: Optional[str]
+    orientation: Optional[str]
+    gif: Optional[bool]
+
+    @property
+    def key(self) -> str:
+        """A stable name, used for the part file and the checkpoint."""
+        gif = 'any' if self.gif is None else ('gif' if self.gif else 'still')
+        return f'{self.tag or "any"}.{(self.orientation or "any").lower()}.{gif}'
+
+    def apply(self, query: Query) -> Query:
+        """Returns the query restricted to the partition."""
+        changes: Dict[str, Any] = {}
+        if self.tag is not None:
+            changes['included_tags'] = query.included_tags + (self.tag,)
+        if self.orientation is not None:
+            changes['orientation'] = self.orientation
+        if self.gif is not None:
+            changes['gif'] = self.gif
+        return query.replace(**changes)
+
+
+def make_partitions(
+        tags: Iterable[Optional[str]],
+        orientations: Iterable[Optional[str]] = ORIENTATIONS,
+        gifs: Iterable[Optional[bool]] = GIFS,
+) -> List[Partition]:
+    """Returns the tags x orientations x gifs partitions.
+    An image matching several partitions (e.g. having two of the tags) is harvested several times, the duplicates are
+    dropped when the parts are merged.
+    """
+    orientations = list(orientations)
+    gifs = list(gifs)
+    return [Partition(tag, orientation, gif) for tag in tags for orientation in orientations for gif in gifs]
+
+
+# Each worker process keeps its own event loop and client for all the partitions it is given.
+_worker = {}
+
+
+def _init_worker(token: Optional[str], base_url: str, rate: Optional[float]) -> None:
+    from .aioclient import WaifuAioClient
+    from .ratelimit import RateLimiter
+    from .retry import RetryPolicy
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    client = WaifuAioClient(
+        token=token,
+        base_url=base_url,
+        coalesce=False,
+        rate_limiter=RateLimiter(rate=rate) if rate else None,
+        retry_policy=RetryPolicy(max_attempts=5, deadline=None),
+        lazy=True,
+    )
+    _worker.update(loop=loop, client=client)
+    # atexit handlers do not run in the pool processes, multiprocessing finalizers do.
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker() -> None:
+    loop = _worker.pop('loop', None)
+    if loop is not None:
+        loop.run_until_complete(_worker.pop('client').close())
+        loop.close()
+
+
+def _harvest_partition(query: Query, path: str) -> int:
+    try:
+        return _worker['loop'].run_until_complete(harvest_query(_worker['client'], query, path))
+    except Exception as e:
+        # The error is pickled back to the main process, one that can not be rebuilt there would break the whole pool
+        # and fail every partition, so it is replaced by its message.
+        try:
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            raise WaifuException(f'{type(e).__name__}: {e}') from None
+        raise
+
+
+async def harvest_query(client, query: Query, path: str) -> int:
+    """Writes every image matching the query to path as json lines and returns how many were written.
+    The images are fetched with a single full request: paging with iter_search samples the images randomly and can not
+    tell when it has seen all of them. The file is written under a temporary name and renamed once complete, so an
+    existing path is always a complete part.
+    Raises:
+        InvalidQuery: If query.full is not set.
+    """
+    if not query.full:
+        raise InvalidQuery('full', query.full, 'a harvest needs full queries to get every image')
+    try:
+        infos = await client.search(query=query, raw=True, use_cache=False)
+        images = infos['images']
+    except APIException as e:
+        if e.status != 404:  # 404 means no image matches
+            raise
+        images = []
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for im in images:
+            f.write(json.dumps(im, separators=(',', ':'), ensure_ascii=False) + '\n')
+    os.replace(tmp, path)
+    return len(images)
+
+
+class Harvester:
+    """Exports the catalog metadata by running many searches across a process pool.
+
+    The query space is split into tags x orientations x gifs partitions, each one is harvested by a worker process
+    (with its own WaifuAioClient) with a single full request into a json lines part file. Completed partitions are
+    recorded in a checkpoint, so an interrupted run only harvests the missing ones when started again. Finally the parts
+    are merged into the output file, without the images harvested by several partitions.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            token: Optional[str] = None,
+            query: Optional[Query] = None,
+            tags: Optional[Iterable[str]] = None,
+            orientations: Iterable[Optional[str]] = ORIENTATIONS,
+            gifs: Iterable[Optional[bool]] = GIFS,
+            processes: Optional[int] = None,
+            rate: Optional[float] = None,
+            base_url: str = APIBaseURL,
+            output_format: Optional[str] = None,
+            keep_parts: bool = False,
+    ) -> None:
+        """Initializes the harvester.
+        Attributes:
+            path: The output file.
+            token: An admin token, needed for the full queries.
+            query: The filters shared by all the partitions (e.g. Query(is_nsfw='null')), full is always set.
+            tags: The tags to partition on, defaults to all the tags of the API.
+            orientations: The orientations to partition on, [None] to not partition on it.
+            gifs: The gif values to partition on, [None] to not partition on it.
+            processes: The number of worker processes, defaults to the number of CPUs.
+            rate: The maximum number of requests per second of each process.
+            base_url: The API base url.
+            output_format: 'jsonl' or 'parquet' (needs pyarrow), guessed from the path extension by default.
+            keep_parts: If True the working directory (parts and checkpoint) is kept after a successful merge.
+        """
+        self.path = path
+        self.token = token
+        if not token:
+            raise NoToken("the harvester sends full queries, which are only accessible to admins and need a token")
+        self.query = (query if query is not None else Query(is_nsfw='null')).replace(full=True)
+        self.tags = list(tags) if tags is not None else None
+        self.orientations = list(orientations)
+        self.gifs = list(gifs)
+        self.processes = processes
+        self.rate = rate
+        self.base_url = base_url
+        self.output_format = output_format or ('parquet' if path.endswith('.parquet') else 'jsonl')
+        if self.output_format not in ('jsonl', 'parquet'):
+            raise ValueError(f"output_format must be 'jsonl' or 'parquet', not {self.output_format!r}")
+        if self.output_format == 'parquet':
+            import pyarrow  # noqa: F401, fail early rather than after the harvest
+        self.keep_parts = keep_parts
+        self.work_dir = path + '.harvest'
+        self.completed: Dict[str, int] = {}
+        self.failures: Dict[str, str] = {}
+        self.images = 0
+        self.duplicates = 0
+
+    @property
+    def checkpoint_path(self) -> str:
+        return os.path.join(self.work_dir, 'checkpoint.json')
+
+    def part_path(self, partition: Partition) -> str:
+        return os.path.join(self.work_dir, f'{partition.key}.jsonl')
+
+    async def _fetch_tags(self) -> List[str]:
+        from .aioclient import WaifuAioClient
+
+        async with WaifuAioClient(token=self.token, base_url=self.base_url) as client:
+            tags = await client.tags()
+        names = tags.get('versatile', [])
+        if self.query.is_nsfw is not False:
+            names += tags.get('nsfw', [])
+        return sorted(set(names))
+
+    def partitions(self) -> List[Partition]:
+        """Returns the partitions to harvest, fetching the tags from the API if they were not given."""
+        if self.tags is None:
+            self.tags = asyncio.run(self._fetch_tags())
+        tags = [tag for tag in self.tags if tag.lower() not in self.query.excluded_tags] or [None]
+        return make_partitions(tags, self.orientations, self.gifs)
+
+    def _load_checkpoint(self) -> None:
+        self.completed = {}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return
+        # A checkpoint made with other filters can not be resumed.
+        if checkpoint.get('version') == CHECKPOINT_VERSION and checkpoint.get('query') == self._fingerprint():
+            self.completed = checkpoint['completed']
+
+    def _save_checkpoint(self) -> None:
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': CHECKPOINT_VERSION, 'query': self._fingerprint(), 'completed': self.completed}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _fingerprint(self) -> str:
+        return self.query.query_string
+
+    def run(
+            self,
+            resume: bool = True,
+            on_progress: Optional[Callable[[Partition, int, Optional[BaseException]], Any]] = None,
+    ) -> int:
+        """Harvests the missing partitions then merges the parts into the output file.
+        Kwargs:
+            resume: If False the checkpoint is ignored and every partition is harvested again.
+            on_progress: Called in the main process when a partition completes, with the partition, the number of images
+            it contains and the error that made it fail (or None).
+        Returns:
+            The number of unique images written.
+        Raises:
+            HarvestError: If some partitions failed, the output file is not written but the completed partitions are
+            kept for the next run.
+        """
+        os.makedirs(self.work_dir, exist_ok=True)
+        if resume:
+            self._load_checkpoint()
+        else:
+            self.completed = {}
+        self.failures = {}
+        partitions = self.partitions()
+        pending = [p for p in partitions if p.key not in self.completed or not os.path.exists(self.part_path(p))]
+
+        if pending:
+            with ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    initializer=_init_worker,
+                    initargs=(self.token, self.base_url, self.rate),
+            ) as executor:
+                futures = {
+                    executor.submit(_harvest_partition, p.apply(self.query), self.part_path(p)): p
+                    for p in pending
+                }
+                for future in as_completed(futures):
+                    partition = futures[future]
+                    error = future.exception()
+                    count = 0
+                    if error is None:
+                        count = future.result()
+                        self.completed[partition.key] = count
+                        self._save_checkpoint()
+                    else:
+                        self.failures[partition.key] = f'{type(error).__name__}: {error}'
+                    if on_progress is not None:
+                        on_progress(partition, count, error)
+
+        if self.failures:
+            raise HarvestError(self.failures)
+        self.images = self._merge(partitions)
+        if not self.keep_parts:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        return self.images
+
+    def iter_images(self, partitions: Iterable[Partition]) -> Iterator[Dict]:
+        """Yields the images of the part files, skipping the ones already yielded."""
+        seen = set()
+        self.duplicates = 0
+        for partition in partitions:
+            with open(self.part_path(partition), 'r', encoding='utf-8') as f:
+                for line in f:
+                    image = json.loads(line)
+                    if image['image_id'] in seen:
+                        self.duplicates += 1
+                        continue
+                    seen.add(image['image_id'])
+                    yield image
+
+    def _merge(self, partitions: List[Partition]) -> int:
+        tmp = self.path + '.tmp'
+        if self.output_format == 'parquet':
+            count = _write_parquet(tmp, self.iter_images(partitions))
+        else:
+            count = 0
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for image in self.iter_images(partitions):
+                    f.write(json.dumps(image, separators=(',', ':'), ensure_ascii=False) + '\n')
+                    count += 1
+        os.replace(tmp, self.path)
+        return count
+
+
+def _write_parquet(path: str, images: Iterable[Dict], batch_size: int = 10000) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {'int64': pa.int64(), 'string': pa.string(), 'bool': pa.bool_(), 'list<string>': pa.list_(pa.string())}
+    schema = pa.schema([(name, types[kind]) for name, kind in PARQUET_COLUMNS])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        batch = {name: [] for name, _ in PARQUET_COLUMNS}
+        for image in images:
+            for name, _ in PARQUET_COLUMNS:
+                value = image.get(name)
+                if name == 'tags':
+                    value = [tag['name'] for tag in value or []]
+                elif name == 'artist' and value is not None:
+                    value = json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+                batch[name].append(value)
+            count += 1
+            if count % batch_size == 0:
+                writer.write_table(pa.table(batch, schema=schema))
+                batch = {name: [] for name, _ in PARQUET_COLUMNS}
+        if batch['image_id']:
+            writer.write_table(pa.table(batch, schema=schema))
+    return count
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m waifuim.harvest',
+        description='Exports the catalog metadata to a json lines or parquet file.',
+    )
+    parser.add_argument('output', help='the output file, .parquet for parquet (needs pyarrow) else json lines')
+    parser.add_argument('--token', default=os.environ.get('WAIFUIM_TOKEN'),
+                        help='an admin token, defaults to the WAIFUIM_TOKEN environment variable')
+    parser.add_argument('--tags', nargs='+', help='the tags to partition on, defaults to all the tags')
+    parser.add_argument('--orientations', nargs='+', default=list(ORIENTATIONS),
+                        help='the orientations to partition on, "any" to not partition on it')
+    parser.add_argument('--no-gif-split', action='store_true', help='do not partition on gif')
+    parser.add_argument('--nsfw', default='null', choices=('null', 'true', 'false'), help='the is_nsfw filter')
+    parser.add_argument('--processes', type=int, help='worker processes, defaults to the number of CPUs')
+    parser.add_argument('--rate', type=float, help='maximum requests per second of each process')
+    parser.add_argument('--base-url', default=APIBaseURL)
+    parser.add_argument('--no-resume', action='store_true', help='ignore the checkpoint of a previous run')
+    parser.add_argument('--keep-parts', action='store_true', help='keep the part files and the checkpoint')
+    args = parser.parse_args(argv)
+
+    harvester = Harvester(
+        args.output,
+        token=args.token,
+        query=Query(is_nsfw=args.nsfw),
+        tags=args.tags,
+        orientations=[None if o.lower() == 'any' else o for o in args.orientations],
+        gifs=[None] if args.no_gif_split else GIFS,
+        processes=args.processes,
+        rate=args.rate,
+        base_url=args.base_url,
+        keep_parts=args.keep_parts,
+    )
+
+    def on_progress(partition, count, error):
+        status = f'failed ({error})' if error is not None else f'{count} images'
+        print(f'{partition.key}: {status}', file=sys.stderr)
+
+    try:
+        count = harvester.run(resume=not args.no_resume, on_progress=on_progress)
+    except HarvestError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f'{count} images written to {args.output} ({harvester.duplicates} duplicates dropped)', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    # Run the imported module rather than __main__, so the worker functions are pickled as waifuim.harvest.*
+    from waifuim.harvest import main as _main
+    sys.exit(_main())
@@ -0,0 +1,70 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+from typing import (
+    Optional,
+)
+
+
+class EventHook:
+    """Base class of the objects receiving the events of WaifuAioClient (see WaifuAioClient.add_hook).
+    Override the methods of the events you are interested in, durations are in seconds and sizes in bytes.
+    The network timings (on_dns_resolved, on_connection_created and on_first_byte) are only reported for the session
+    created by the client when a hook is registered before the first request, pass the trace config returned by
+    WaifuAioClient.create_trace_config to your own session otherwise.
+    """
+
+    def on_request_start(self, method: str, url: str, endpoint: str) -> None:
+        pass
+
+    def on_request_end(self, method: str, url: str, endpoint: str, status: int, duration: float, size: int) -> None:
+        pass
+
+    def on_request_error(self, method: str, url: str, endpoint: str, error: Exception, duration: float) -> None:
+        pass
+
+    def on_dns_resolved(self, host: str, duration: float) -> None:
+        pass
+
+    def on_connection_created(self, duration: float) -> None:
+        pass
+
+    def on_first_byte(self, method: str, url: str, duration: float) -> None:
+        pass
+
+    def on_json_decoded(self, endpoint: str, duration: float, size: int) -> None:
+        pass
+
+    def on_images_built(self, count: int, duration: float) -> None:
+        pass
+
+    def on_retry(self, endpoint: str, attempt: int, delay: float, error: Optional[Exception]) -> None:
+        pass
+
+    def on_cache_hit(self, endpoint: str, fresh: bool) -> None:
+        pass
+
+    def on_cache_miss(self, endpoint: str) -> None:
+        pass
+
+    def on_coalesced(self, endpoint: str) -> None:
+        pass
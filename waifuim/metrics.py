@@ -0,0 +1,203 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import bisect
+from collections import defaultdict
+from typing import (
+    Dict,
+    List,
+    Sequence,
+    Tuple,
+)
+
+from .hooks import EventHook
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class PrometheusExporter(EventHook):
+    def __init__(self, namespace: str = 'waifuim', buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """Collects the client events as Prometheus metrics, render returns them in the text exposition format.
+        Attributes:
+            namespace: The prefix of the metric names.
+            buckets: The upper bounds (in seconds) of the histograms buckets.
+        """
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self.counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[Labels, _Histogram]] = defaultdict(dict)
+
+    def _inc(self, name: str, labels: Labels = (), value: float = 1) -> None:
+        self.counters[name][labels] += value
+
+    def _observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        histogram = self.histograms[name].get(labels)
+        if histogram is None:
+            histogram = self.histograms[name][labels] = _Histogram(self.buckets)
+        histogram.observe(value)
+
+    def on_request_end(self, method, url, endpoint, status, duration, size):
+        labels = (('endpoint', endpoint), ('method', method), ('status', str(status)))
+        self._inc('requests_total', labels)
+        self._inc('response_bytes_total', (('endpoint', endpoint),), size)
+        self._observe('request_duration_seconds', duration, (('endpoint', endpoint),))
+
+    def on_request_error(self, method, url, endpoint, error, duration):
+        self._inc('request_errors_total', (('endpoint', endpoint), ('error', type(error).__name__)))
+
+    def on_dns_resolved(self, host, duration):
+        self._observe('dns_duration_seconds', duration)
+
+    def on_connection_created(self, duration):
+        self._observe('connect_duration_seconds', duration)
+
+    def on_first_byte(self, method, url, duration):
+        self._observe('time_to_first_byte_seconds', duration)
+
+    def on_json_decoded(self, endpoint, duration, size):
+        self._observe('json_decode_seconds', duration, (('endpoint', endpoint),))
+
+    def on_images_built(self, count, duration):
+        self._inc('images_built_total', (), count)
+        self._observe('images_build_seconds', duration)
+
+    def on_retry(self, endpoint, attempt, delay, error):
+        self._inc('retries_total', (('endpoint', endpoint),))
+
+    def on_cache_hit(self, endpoint, fresh):
+        self._inc('cache_hits_total', (('endpoint', endpoint), ('fresh', str(fresh).lower())))
+
+    def on_cache_miss(self, endpoint):
+        self._inc('cache_misses_total', (('endpoint', endpoint),))
+
+    def on_coalesced(self, endpoint):
+        self._inc('coalesced_requests_total', (('endpoint', endpoint),))
+
+    def render(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for name, values in sorted(self.counters.items()):
+            full_name = f'{self.namespace}_{name}'
+            lines.append(f'# TYPE {full_name} counter')
+            for labels, value in values.items():
+                lines.append(f'{full_name}{_format_labels(labels)} {value:g}')
+        for name, values in sorted(self.histograms.items()):
+            full_name = f'{self.namespace}_{name}'
+            lines.append(f'# TYPE {full_name} histogram')
+            for labels, histogram in values.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = _format_labels(labels, f'le="{bound:g}"')
+                    lines.append(f'{full_name}_bucket{le} {cumulative}')
+                le = _format_labels(labels, 'le="+Inf"')
+                lines.append(f'{full_name}_bucket{le} {histogram.count}')
+                lines.append(f'{full_name}_sum{_format_labels(labels)} {histogram.sum:g}')
+                lines.append(f'{full_name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class OpenTelemetryExporter(EventHook):
+    def __init__(self, meter=None) -> None:
+        """Records the client events with the OpenTelemetry metrics API (the opentelemetry-api package is required).
+        Attributes:
+            meter: The meter used to create the instruments, defaults to the meter of the global meter provider.
+        """
+        if meter is None:
+            from opentelemetry import metrics
+            meter = metrics.get_meter('waifuim')
+        self.meter = meter
+        self.requests = meter.create_counter('waifuim.requests', description='HTTP requests sent to the API')
+        self.errors = meter.create_counter('waifuim.request.errors', description='Requests that failed to complete')
+        self.response_size = meter.create_counter('waifuim.response.size', unit='By')
+        self.duration = meter.create_histogram('waifuim.request.duration', unit='s')
+        self.dns_duration = meter.create_histogram('waifuim.dns.duration', unit='s')
+        self.connect_duration = meter.create_histogram('waifuim.connect.duration', unit='s')
+        self.time_to_first_byte = meter.create_histogram('waifuim.time_to_first_byte', unit='s')
+        self.json_decode_duration = meter.create_histogram('waifuim.json_decode.duration', unit='s')
+        self.images_build_duration = meter.create_histogram('waifuim.images_build.duration', unit='s')
+        self.retries = meter.create_counter('waifuim.retries')
+        self.cache_hits = meter.create_counter('waifuim.cache.hits')
+        self.cache_misses = meter.create_counter('waifuim.cache.misses')
+        self.coalesced = meter.create_counter('waifuim.coalesced_requests')
+
+    def on_request_end(self, method, url, endpoint, status, duration, size):
+        attributes = {'endpoint': endpoint, 'method': method, 'status': status}
+        self.requests.add(1, attributes)
+        self.response_size.add(size, {'endpoint': endpoint})
+        self.duration.record(duration, attributes)
+
+    def on_request_error(self, method, url, endpoint, error, duration):
+        self.errors.add(1, {'endpoint': endpoint, 'error': type(error).__name__})
+
+    def on_dns_resolved(self, host, duration):
+        self.dns_duration.record(duration, {'host': host})
+
+    def on_connection_created(self, duration):
+        self.connect_duration.record(duration)
+
+    def on_first_byte(self, method, url, duration):
+        self.time_to_first_byte.record(duration, {'method': method})
+
+    def on_json_decoded(self, endpoint, duration, size):
+        self.json_decode_duration.record(duration, {'endpoint': endpoint})
+
+    def on_images_built(self, count, duration):
+        self.images_build_duration.record(duration)
+
+    def on_retry(self, endpoint, attempt, delay, error):
+        self.retries.add(1, {'endpoint': endpoint})
+
+    def on_cache_hit(self, endpoint, fresh):
+        self.cache_hits.add(1, {'endpoint': endpoint, 'fresh': fresh})
+
+    def on_cache_miss(self, endpoint):
+        self.cache_misses.add(1, {'endpoint': endpoint})
+
+    def on_coalesced(self, endpoint):
+        self.coalesced.add(1, {'endpoint': endpoint})
@@ -0,0 +1,157 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+import contextlib
+from collections import deque
+from typing import (
+    Deque,
+    Dict,
+    Optional,
+    Type,
+    Union,
+)
+
+from .aioclient import WaifuAioClient
+from .exceptions import APIException
+from .types import Image, LazyImage
+from .utils import make_request_key
+
+
+class _Buffer:
+    __slots__ = ('kwargs', 'images', 'recent', 'task')
+
+    def __init__(self, kwargs: Dict, recent_size: int) -> None:
+        self.kwargs = kwargs
+        self.images: Deque[Union[Image, LazyImage]] = deque()
+        self.recent: Deque[int] = deque(maxlen=recent_size)
+        self.task: Optional[asyncio.Future] = None
+
+
+class ImagePrefetcher(contextlib.AbstractAsyncContextManager):
+    def __init__(
+            self,
+            client: WaifuAioClient,
+            low_watermark: int = 5,
+            high_watermark: int = 30,
+            batch_size: int = 30,
+            recent_size: int = 300,
+            lazy: bool = None,
+    ) -> None:
+        """Keeps a buffer of images for each set of search kwargs so that random picks are served from memory.
+        When a buffer gets below the low watermark, it is topped up to the high watermark in the background.
+        The buffered images and the recently served ones are excluded from the refills to avoid repeats, unless every
+        matching image was recently served.
+        Attributes:
+            client: The client used to fetch the images.
+            low_watermark: The number of buffered images under which a refill starts.
+            high_watermark: The number of images a refill tries to reach.
+            batch_size: The maximum number of images requested at once (greater than 30 is only accessible to admins).
+            recent_size: How many served images are remembered to avoid repeats.
+            lazy: If True buffer LazyImage instances, defaults to the lazy attribute of the client.
+        """
+        self.client = client
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.batch_size = batch_size
+        self.recent_size = recent_size
+        self.lazy = lazy
+        self._buffers: Dict[tuple, _Buffer] = {}
+
+    async def __aexit__(
+            self,
+            exception_type: Type[Exception],
+            exception: Exception,
+            exception_traceback,
+    ) -> None:
+        await self.close()
+
+    def _get_buffer(self, kwargs: Dict) -> _Buffer:
+        token = kwargs.get('token')
+        params = self.client._create_params(**{k: v for k, v in kwargs.items() if k != 'token'})
+        key = make_request_key('search', params, {'Authorization': token} if token else None)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = _Buffer(kwargs, self.recent_size)
+        return buffer
+
+    async def _refill(self, buffer: _Buffer) -> None:
+        while len(buffer.images) < self.high_watermark:
+            excluded = list(buffer.kwargs.get('excluded_files') or [])
+            excluded.extend(image.image_id for image in buffer.images)
+            excluded.extend(buffer.recent)
+            try:
+                infos = await self.client.search(**{
+                    **buffer.kwargs,
+                    'excluded_files': excluded,
+                    'limit': min(self.high_watermark - len(buffer.images), self.batch_size),
+                    'raw': True,
+                    'use_cache': False,
+                })
+            except APIException as e:
+                if e.status == 404:  # every matching image is buffered or was recently served
+                    break
+                raise
+            known = set(excluded)
+            new = [im for im in infos['images'] if im['image_id'] not in known]
+            if not new:
+                break
+            buffer.images.extend(self.client._build_image(im, self.lazy) for im in new)
+
+    def _start_refill(self, buffer: _Buffer) -> asyncio.Future:
+        if buffer.task is None or buffer.task.done():
+            buffer.task = asyncio.ensure_future(self._refill(buffer))
+            # Errors of background refills are raised by the next get() that has to wait for a refill.
+            buffer.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return buffer.task
+
+    async def get(self, **kwargs) -> Union[Image, LazyImage]:
+        """Returns a random image matching the search kwargs (see WaifuAioClient.search), from memory if possible.
+        Raises:
+            APIException: If the API response contains an error or if no image matches the criteria.
+        """
+        buffer = self._get_buffer(kwargs)
+        if not buffer.images:
+            await asyncio.shield(self._start_refill(buffer))
+        if not buffer.images and buffer.recent:
+            # Fewer images match than recent_size, serving repeats is better than nothing.
+            buffer.recent.clear()
+            await asyncio.shield(self._start_refill(buffer))
+        if not buffer.images:
+            raise APIException(404, 'No image found matching the criteria given.')
+        image = buffer.images.popleft()
+        buffer.recent.append(image.image_id)
+        if len(buffer.images) < self.low_watermark:
+            self._start_refill(buffer)
+        return image
+
+    async def warm(self, **kwargs) -> None:
+        """Fills the buffer of the given search kwargs up to the high watermark."""
+        await asyncio.shield(self._start_refill(self._get_buffer(kwargs)))
+
+    async def close(self) -> None:
+        """Cancels the pending refills and drops the buffered images."""
+        tasks = [buffer.task for buffer in self._buffers.values() if buffer.task is not None and not buffer.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._buffers.clear()
@@ -0,0 +1,204 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import re
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urlencode
+
+from .exceptions import InvalidQuery
+from .utils import make_params_key
+
+ORDER_BY = frozenset(('FAVORITES', 'UPLOADED_AT', 'LIKED_AT', 'RANDOM'))
+ORIENTATIONS = frozenset(('LANDSCAPE', 'PORTRAIT', 'RANDOM'))
+OPERATORS = ('<=', '>=', '!=', '<', '>', '=')
+
+_FILTER_RE = re.compile(r'^\s*(<=|>=|!=|<|>|=)?\s*(\d+)\s*$')
+
+_FIELDS = (
+    'included_tags', 'excluded_tags', 'included_files', 'excluded_files', 'is_nsfw', 'limit', 'order_by',
+    'orientation', 'width', 'height', 'byte_size', 'gif', 'full',
+)
+
+
+def parse_filter(name: str, expression: Union[str, int]) -> Tuple[str, int]:
+    """Parses a width, height or byte_size filter (e.g. '>=2000') into an (operator, value) couple.
+    Raises:
+        InvalidQuery: If the expression is not a valid filter.
+    """
+    if isinstance(expression, bool):
+        raise InvalidQuery(name, expression, 'expected an integer optionally preceded by an operator')
+    if isinstance(expression, int):
+        return '=', expression
+    match = _FILTER_RE.match(str(expression))
+    if match is None:
+        raise InvalidQuery(name, expression, f'expected an integer optionally preceded by one of {", ".join(OPERATORS)}')
+    return match.group(1) or '=', int(match.group(2))
+
+
+def _normalize_tags(name: str, tags: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    if tags is None:
+        return ()
+    if isinstance(tags, str):
+        tags = (tags,)
+    normalized = []
+    for tag in tags:
+        if not isinstance(tag, str) or not tag.strip():
+            raise InvalidQuery(name, tag, 'tags must be non empty strings')
+        normalized.append(tag.strip().lower())
+    return tuple(dict.fromkeys(normalized))  # removes the duplicates, keeping the order
+
+
+def _normalize_files(name: str, files: Optional[Iterable[Any]]) -> Tuple[Union[int, str], ...]:
+    if files is None:
+        return ()
+    if isinstance(files, (str, int)) or hasattr(files, 'image_id'):
+        files = (files,)
+    normalized = []
+    for file in files:
+        file = getattr(file, 'image_id', file)
+        if isinstance(file, str) and file.isdigit():
+            file = int(file)
+        normalized.append(file)
+    return tuple(dict.fromkeys(normalized))
+
+
+class Query:
+    """An immutable, validated set of search filters.
+    It is validated and encoded once, so it can be passed to search, fav, iter_search and iter_fav again and again for
+    free. Validation errors are raised by the constructor, before any request is sent.
+    The kwargs are the same as WaifuAioClient.search ones.
+    Raises:
+        InvalidQuery: If a filter is not valid.
+    """
+
+    __slots__ = _FIELDS + ('params', 'params_key', 'query_string')
+
+    def __init__(
+            self,
+            included_tags: Iterable[str] = None,
+            excluded_tags: Iterable[str] = None,
+            included_files: Iterable[Any] = None,
+            excluded_files: Iterable[Any] = None,
+            is_nsfw: Union[bool, str] = None,
+            limit: int = None,
+            order_by: str = None,
+            orientation: str = None,
+            width: Union[str, int] = None,
+            height: Union[str, int] = None,
+            byte_size: Union[str, int] = None,
+            gif: bool = None,
+            full: bool = None,
+    ) -> None:
+        values = {
+            'included_tags': _normalize_tags('included_tags', included_tags),
+            'excluded_tags': _normalize_tags('excluded_tags', excluded_tags),
+            'included_files': _normalize_files('included_files', included_files),
+            'excluded_files': _normalize_files('excluded_files', excluded_files),
+        }
+        conflicts = set(values['included_tags']) & set(values['excluded_tags'])
+        if conflicts:
+            raise InvalidQuery('excluded_tags', sorted(conflicts), 'tags can not be both included and excluded')
+
+        if isinstance(is_nsfw, str):
+            if is_nsfw.lower() not in ('null', 'true', 'false'):
+                raise InvalidQuery('is_nsfw', is_nsfw, "expected a boolean or 'null'")
+            is_nsfw = {'null': 'null', 'true': True, 'false': False}[is_nsfw.lower()]
+        elif is_nsfw is not None and not isinstance(is_nsfw, bool):
+            raise InvalidQuery('is_nsfw', is_nsfw, "expected a boolean or 'null'")
+        values['is_nsfw'] = is_nsfw
+
+        if limit is not None:
+            if isinstance(limit, str) and limit.isdigit():
+                limit = int(limit)
+            if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1:
+                raise InvalidQuery('limit', limit, 'expected a positive integer')
+        values['limit'] = limit
+
+        if order_by is not None:
+            order_by = str(order_by).upper()
+            if order_by not in ORDER_BY:
+                raise InvalidQuery('order_by', order_by, f'expected one of {", ".join(sorted(ORDER_BY))}')
+        values['order_by'] = order_by
+
+        if orientation is not None:
+            orientation = str(orientation).upper()
+            if orientation not in ORIENTATIONS:
+                raise InvalidQuery('orientation', orientation, f'expected one of {", ".join(sorted(ORIENTATIONS))}')
+        values['orientation'] = orientation
+
+        for name, expression in (('width', width), ('height', height), ('byte_size', byte_size)):
+            if expression is not None:
+                operator, value = parse_filter(name, expression)
+                expression = f'{operator}{value}'
+            values[name] = expression
+
+        for name, flag in (('gif', gif), ('full', full)):
+            if flag is not None and not isinstance(flag, bool):
+                raise InvalidQuery(name, flag, 'expected a boolean')
+            values[name] = flag
+
+        # Same format as WaifuAioClient._create_params
+        params: Dict[str, Any] = {}
+        for name in _FIELDS:
+            value = values[name]
+            object.__setattr__(self, name, value)
+            if value is None or value == ():
+                continue
+            if isinstance(value, tuple):
+                params[name] = list(value)
+            elif isinstance(value, bool):
+                params[name] = str(value)
+            else:
+                params[name] = value
+        object.__setattr__(self, 'params', params)
+        object.__setattr__(self, 'params_key', make_params_key(params))
+        object.__setattr__(self, 'query_string', urlencode(params, doseq=True))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('Query objects are immutable, use replace() to get a modified copy')
+
+    def __delattr__(self, item):
+        raise AttributeError('Query objects are immutable, use replace() to get a modified copy')
+
+    def __reduce__(self):
+        # The default protocol sets the slots one by one, which __setattr__ forbids.
+        return Query, tuple(getattr(self, name) for name in _FIELDS)
+
+    def replace(self, **changes) -> 'Query':
+        """Returns a copy of the query with the given filters changed."""
+        return Query(**{**{name: getattr(self, name) for name in _FIELDS}, **changes})
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.params_key == other.params_key
+
+    def __hash__(self):
+        return hash(self.params_key)
+
+    def __repr__(self):
+        return f'Query({self.query_string!r})'
@@ -0,0 +1,181 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import (
+    Dict,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Returns how many seconds the API asked us to wait according to the response headers, if any.
+    Both the Retry-After header (seconds or HTTP date) and the X-RateLimit-*/RateLimit-* headers are understood.
+    """
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    remaining = headers.get('X-RateLimit-Remaining', headers.get('RateLimit-Remaining'))
+    reset = headers.get('X-RateLimit-Reset', headers.get('RateLimit-Reset'))
+    if remaining is not None and reset is not None:
+        try:
+            if float(remaining) > 0:
+                return None
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Some APIs send an epoch timestamp, others a number of seconds.
+        if reset > 1e9:
+            reset -= time.time()
+        return max(reset, 0.0)
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """A token bucket, callers wait in order until a token is available instead of failing.
+        Attributes:
+            rate: The number of tokens added per second.
+            capacity: The maximum number of tokens (the allowed burst), defaults to the rate.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def delay(self) -> float:
+        """Returns the number of seconds before a token is available."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def is_idle(self) -> bool:
+        """Returns whether the bucket is full, not blocked and not awaited, i.e. the same as a new one."""
+        now = time.monotonic()
+        self._refill(now)
+        waited = self._lock is not None and self._lock.locked()
+        return self.tokens >= self.capacity and self.blocked_until <= now and not waited
+
+    def block(self, seconds: float) -> None:
+        """Prevents any token from being handed out for the given number of seconds."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def try_acquire(self) -> bool:
+        """Consumes a token if one is available right now, returns whether it did."""
+        if self.delay() > 0:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self) -> None:
+        """Waits for a token and consumes it."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            wait = self.delay()
+            while wait > 0:
+                await asyncio.sleep(wait)
+                wait = self.delay()
+            self.tokens -= 1
+
+
+class RateLimiter:
+    def __init__(
+            self,
+            rate: float = 10.0,
+            burst: Optional[float] = None,
+            max_concurrency: int = 10,
+            endpoint_limits: Optional[Dict[str, Tuple[float, Optional[float]]]] = None,
+            token_limits: Optional[Dict[str, Tuple[float, Optional[float]]]] = None,
+            max_retries: int = 3,
+            default_backoff: float = 1.0,
+            max_buckets: int = 10000,
+    ) -> None:
+        """Client side rate limiting and concurrency limiting used by WaifuAioClient.
+        A token bucket is kept for each (endpoint, token) couple, except for the tokens of token_limits which have a
+        single bucket shared by all the endpoints.
+        Attributes:
+            rate: The default number of requests per second.
+            burst: The default number of requests that can be sent at once, defaults to the rate.
+            max_concurrency: The maximum number of requests running at the same time.
+            endpoint_limits: Per endpoint (rate, burst), e.g. {'search': (5, 10)}.
+            token_limits: Per token (rate, burst), the budget of the token across all the endpoints. The endpoint limits
+            do not apply to these tokens.
+            max_retries: How many times a request that got a 429 response is queued again before raising RateLimited.
+            default_backoff: How long to wait after a 429 response that does not say how long to wait.
+            max_buckets: Above this number of buckets, the idle ones (full, as if they were new) are dropped.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.endpoint_limits = endpoint_limits or {}
+        self.token_limits = token_limits or {}
+        self.max_retries = max_retries
+        self.default_backoff = default_backoff
+        self.max_buckets = max_buckets
+        self._buckets: Dict[Tuple[Optional[str], Optional[str]], TokenBucket] = {}
+        self._prune_at = max_buckets
+        self._semaphore = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so that it is bound to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def bucket(self, endpoint: str, token: Optional[str] = None) -> TokenBucket:
+        """Returns the bucket of the given endpoint and token, creating it if needed."""
+        token_limit = self.token_limits.get(token)
+        key = (None, token) if token_limit else (endpoint, token)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = token_limit or self.endpoint_limits.get(endpoint) or (self.rate, self.burst)
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            if len(self._buckets) > self._prune_at:
+                self._prune()
+        return bucket
+
+    def _prune(self) -> None:
+        for key in [k for k, b in self._buckets.items() if b.is_idle()]:
+            del self._buckets[key]
+        # If most buckets are still in use, wait for the count to double before scanning them again.
+        self._prune_at = max(self.max_buckets, 2 * len(self._buckets))
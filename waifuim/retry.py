@@ -0,0 +1,117 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import random
+import time
+from typing import (
+    FrozenSet,
+    Iterable,
+    Optional,
+)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy:
+    def __init__(
+            self,
+            max_attempts: int = 3,
+            base_delay: float = 0.5,
+            max_delay: float = 8.0,
+            deadline: Optional[float] = 30.0,
+            retry_statuses: Iterable[int] = (500, 502, 503, 504),
+    ) -> None:
+        """Retry policy applied to the idempotent (GET) requests of WaifuAioClient.
+        The delay before attempt n + 1 is drawn between 0 and min(max_delay, base_delay * 2 ** (n - 1)) (full jitter),
+        n being the number of attempts already made.
+        Attributes:
+            max_attempts: The maximum number of attempts, including the first one.
+            base_delay: The base delay (in seconds) of the exponential backoff.
+            max_delay: The maximum delay (in seconds) between two attempts.
+            deadline: The maximum time (in seconds) spent on a request including the retries, None for no deadline.
+            retry_statuses: The HTTP status codes considered as transient errors.
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses: FrozenSet[int] = frozenset(retry_statuses)
+
+    def compute_delay(self, attempt: int) -> float:
+        """Returns how long to wait before the next attempt, attempt being the number of attempts already made."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0) -> None:
+        """Fails fast while the API looks down instead of waiting on sockets.
+        The breaker opens after failure_threshold consecutive transient errors, then lets a single request through
+        after recovery_timeout seconds (half open state), closing again if it succeeds.
+        Attributes:
+            failure_threshold: The number of consecutive failures that opens the breaker.
+            recovery_timeout: How long (in seconds) the breaker stays open before trying again.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self._state = CLOSED
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """The state of the breaker, 'closed', 'open' or 'half_open'."""
+        if self._state == OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def retry_in(self) -> float:
+        """Returns how many seconds are left before the breaker lets a request through again."""
+        return max(self.opened_at + self.recovery_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        """Returns whether a request may be sent."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release(self) -> None:
+        """Lets another request probe the API if the current probe was cancelled before completing."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self._state = CLOSED
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._probing = False
+            self._state = OPEN
+            self.opened_at = time.monotonic()
@@ -0,0 +1,123 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import bisect
+import difflib
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from .exceptions import UnknownTag
+from .types import Tag
+
+
+class TagIndex:
+    def __init__(self, tags: Iterable[Tag], groups: Optional[Dict[str, List[Tag]]] = None) -> None:
+        """An in-memory index of the API tags, built from WaifuAioClient.tags(full=True).
+        Attributes:
+            tags: The tags to index.
+            groups: The tags grouped as returned by the API (e.g. {'versatile': [...], 'nsfw': [...]}), if not
+            provided the tags are grouped according to their is_nsfw attribute.
+        """
+        self.by_name: Dict[str, Tag] = {}
+        self.by_id: Dict[int, Tag] = {}
+        for tag in tags:
+            self.by_name[tag.name.lower()] = tag
+            self.by_id[tag.tag_id] = tag
+        if groups is None:
+            groups = {
+                'versatile': [tag for tag in self.by_id.values() if not tag.is_nsfw],
+                'nsfw': [tag for tag in self.by_id.values() if tag.is_nsfw],
+            }
+        self.groups = groups
+        self._sorted_names = sorted(self.by_name)
+
+    @classmethod
+    def from_response(cls, data: Dict[str, List[Dict]]) -> 'TagIndex':
+        """Builds the index from the raw response of the /tags endpoint with full=True."""
+        groups = {group: [Tag.from_data(tag) for tag in tags] for group, tags in data.items()}
+        return cls((tag for tags in groups.values() for tag in tags), groups)
+
+    @property
+    def versatile(self) -> List[Tag]:
+        return self.groups.get('versatile', [])
+
+    @property
+    def nsfw(self) -> List[Tag]:
+        return self.groups.get('nsfw', [])
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __iter__(self) -> Iterator[Tag]:
+        return iter(self.by_id.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self.by_name
+
+    def get(self, name: str) -> Optional[Tag]:
+        """Returns the tag with the given name, None if it does not exist."""
+        return self.by_name.get(name.lower())
+
+    def get_by_id(self, tag_id: int) -> Optional[Tag]:
+        """Returns the tag with the given id, None if it does not exist."""
+        return self.by_id.get(tag_id)
+
+    def suggest(self, text: str, n: int = 5) -> List[str]:
+        """Returns up to n tag names starting with text, completed by the closest names if there are not enough."""
+        text = text.lower()
+        suggestions = []
+        i = bisect.bisect_left(self._sorted_names, text)
+        while i < len(self._sorted_names) and len(suggestions) < n and self._sorted_names[i].startswith(text):
+            suggestions.append(self._sorted_names[i])
+            i += 1
+        if len(suggestions) < n:
+            for name in difflib.get_close_matches(text, self._sorted_names, n=n, cutoff=0.6):
+                if name not in suggestions and len(suggestions) < n:
+                    suggestions.append(name)
+        return suggestions
+
+    def resolve(self, names: Iterable[str], correct: bool = False) -> List[str]:
+        """Checks that every name is a known tag.
+        Args:
+            names: The tag names to check.
+        Kwargs:
+            correct: If True a misspelled name is replaced by the closest tag name when there is one.
+        Returns:
+            The normalized tag names.
+        Raises:
+            UnknownTag: If a name does not match any tag.
+        """
+        resolved = []
+        for name in names:
+            key = str(name).lower().strip()
+            if key not in self.by_name:
+                close = difflib.get_close_matches(key, self._sorted_names, n=1, cutoff=0.8) if correct else None
+                if not close:
+                    raise UnknownTag(name, self.suggest(key))
+                key = close[0]
+            resolved.append(self.by_name[key].name)
+        return resolved
@@ -0,0 +1,190 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+import asyncio
+from collections import deque
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from .aioclient import WaifuAioClient
+from .ratelimit import TokenBucket
+
+TENANT_METHODS = frozenset(('search', 'fav', 'fav_insert', 'fav_delete', 'fav_toggle'))
+
+
+class Tenant:
+    __slots__ = ('pool', 'token')
+
+    def __init__(self, pool: 'TenantPool', token: str) -> None:
+        """The methods of WaifuAioClient bound to a token and scheduled by a TenantPool."""
+        self.pool = pool
+        self.token = token
+
+    async def search(self, *args, **kwargs):
+        return await self.pool.submit(self.token, 'search', *args, **kwargs)
+
+    async def fav(self, *args, **kwargs):
+        return await self.pool.submit(self.token, 'fav', *args, **kwargs)
+
+    async def fav_insert(self, *args, **kwargs):
+        return await self.pool.submit(self.token, 'fav_insert', *args, **kwargs)
+
+    async def fav_delete(self, *args, **kwargs):
+        return await self.pool.submit(self.token, 'fav_delete', *args, **kwargs)
+
+    async def fav_toggle(self, *args, **kwargs):
+        return await self.pool.submit(self.token, 'fav_toggle', *args, **kwargs)
+
+
+class TenantPool:
+    def __init__(
+            self,
+            client: WaifuAioClient,
+            rate: float = 2.0,
+            burst: Optional[float] = None,
+            max_concurrency: int = 10,
+    ) -> None:
+        """Schedules the requests made on behalf of many tokens (users) so that none of them can starve the others.
+        Each token has its own token bucket and its own queue, the queues are served in round robin order by
+        max_concurrency workers sharing the client. Cached responses are already namespaced by token since the
+        cache key includes the authorization, see invalidate to drop the entries of a token.
+        Attributes:
+            client: The client making the requests.
+            rate: The number of requests per second allowed for each token.
+            burst: The number of requests a token can send at once, defaults to the rate.
+            max_concurrency: The maximum number of requests running at the same time, all tokens included.
+        """
+        self.client = client
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._queues: Dict[str, Deque[Tuple[str, tuple, dict, asyncio.Future]]] = {}
+        self._ring: Deque[str] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Future] = []
+
+    async def __aenter__(self) -> 'TenantPool':
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    def tenant(self, token: str) -> Tenant:
+        """Returns an object with the search, fav and fav_* methods of the client, scheduled for the given token."""
+        return Tenant(self, token)
+
+    def pending(self, token: Optional[str] = None) -> int:
+        """Returns the number of queued requests of a token, or of every token."""
+        if token is not None:
+            return len(self._queues.get(token, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def invalidate(self, token: str) -> None:
+        """Drops the cached responses of a token."""
+        if self.client.cache is not None:
+            await self.client.cache.invalidate(token=token)
+
+    async def submit(self, token: str, method: str, *args, **kwargs) -> Any:
+        """Queues a call to a client method on behalf of the given token and returns its result."""
+        if method not in TENANT_METHODS:
+            raise ValueError(f'{method} can not be scheduled, use one of {", ".join(sorted(TENANT_METHODS))}')
+        if not self._workers:
+            self._wakeup = asyncio.Event()
+            self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.max_concurrency)]
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.get(token)
+        if queue is None:
+            queue = self._queues[token] = deque()
+            self._ring.append(token)
+        queue.append((method, args, kwargs, future))
+        self._wakeup.set()
+        return await future
+
+    def _bucket(self, token: str) -> TokenBucket:
+        bucket = self._buckets.get(token)
+        if bucket is None:
+            bucket = self._buckets[token] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _next_job(self) -> Tuple[Optional[tuple], float]:
+        """Returns the next job in round robin order among the tokens having a token available, or how long to wait."""
+        wait = float('inf')
+        for _ in range(len(self._ring)):
+            token = self._ring.popleft()
+            queue = self._queues[token]
+            while queue and queue[0][3].done():  # cancelled by the caller
+                queue.popleft()
+            if not queue:
+                del self._queues[token]
+                continue
+            self._ring.append(token)
+            bucket = self._bucket(token)
+            if bucket.try_acquire():
+                method, args, kwargs, future = queue.popleft()
+                if not queue:
+                    self._ring.remove(token)
+                    del self._queues[token]
+                return (token, method, args, kwargs, future), 0.0
+            wait = min(wait, bucket.delay())
+        return None, wait
+
+    async def _work(self) -> None:
+        while True:
+            job, wait = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), None if wait == float('inf') else wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            token, method, args, kwargs, future = job
+            try:
+                result = await getattr(self.client, method)(*args, token=token, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self) -> None:
+        """Stops the workers, the queued requests are cancelled."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            for *_, future in queue:
+                future.cancel()
+        self._queues.clear()
+        self._ring.clear()
@@ -0,0 +1,110 @@
+"""MIT License
+
+Copyright (c) 2021 Buco
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE."""
+
+from typing import (
+    Optional,
+)
+
+import aiohttp
+
+
+def accepted_encodings() -> str:
+    """Returns the Accept-Encoding header value listing the content encodings the installed aiohttp can decode.
+    gzip and deflate are always supported, br needs brotli (or brotlicffi) and zstd needs aiohttp 3.12+ with zstandard.
+    """
+    encodings = ['gzip', 'deflate']
+    try:
+        from aiohttp.compression_utils import HAS_BROTLI
+    except ImportError:  # aiohttp < 3.9
+        try:
+            import brotli  # noqa: F401
+            HAS_BROTLI = True
+        except ImportError:
+            HAS_BROTLI = False
+    if HAS_BROTLI:
+        encodings.append('br')
+    try:
+        from aiohttp.compression_utils import HAS_ZSTD
+    except ImportError:
+        HAS_ZSTD = False
+    if HAS_ZSTD:
+        encodings.append('zstd')
+    return ', '.join(encodings)
+
+
+ACCEPT_ENCODING = accepted_encodings()
+
+
+class TransportConfig:
+    def __init__(
+            self,
+            limit: int = 100,
+            limit_per_host: int = 30,
+            keepalive_timeout: float = 30.0,
+            ttl_dns_cache: Optional[int] = 300,
+            use_dns_cache: bool = True,
+            connect_timeout: Optional[float] = 10.0,
+            read_timeout: Optional[float] = 30.0,
+            total_timeout: Optional[float] = None,
+    ) -> None:
+        """Connection pool and timeouts settings of the session created by WaifuAioClient.
+        Connections are kept alive and reused between requests (aiohttp does not pipeline requests on HTTP/1.1).
+        Attributes:
+            limit: The total number of simultaneous connections of the pool.
+            limit_per_host: The number of simultaneous connections to the same host.
+            keepalive_timeout: How long (in seconds) an idle connection is kept open for reuse.
+            ttl_dns_cache: How long (in seconds) the resolved addresses are cached, None caches them forever.
+            use_dns_cache: Whether the resolved addresses are cached at all.
+            connect_timeout: The maximum time (in seconds) to get a connection, including waiting for a free one.
+            read_timeout: The maximum time (in seconds) between two reads from the socket.
+            total_timeout: The maximum time (in seconds) of a whole request, None for no limit.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.use_dns_cache = use_dns_cache
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+
+    def create_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=self.use_dns_cache,
+        )
+
+    def create_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            connect=self.connect_timeout,
+            sock_read=self.read_timeout,
+        )
+
+    def create_session(self, **kwargs) -> aiohttp.ClientSession:
+        """Creates a session using this configuration, it can be shared between several clients.
+        The kwargs are passed to aiohttp.ClientSession.
+        """
+        return aiohttp.ClientSession(connector=self.create_connector(), timeout=self.create_timeout(), **kwargs)
@@ -1,12 +1,66 @@
-from dateutil.parser import parse
-
-
-class Artist:
+from datetime import datetime
+from typing import (
+    Dict,
+    Optional,
+    Tuple,
+)
+
+_ARTIST_FIELDS = frozenset(('artist_id', 'name', 'patreon', 'pixiv', 'twitter', 'deviant_art'))
+_TAG_FIELDS = frozenset(('tag_id', 'name', 'description', 'is_nsfw'))
+_IMAGE_FIELDS = frozenset((
+    'signature', 'extension', 'image_id', 'favorites', 'dominant_color', 'source', 'artist', 'uploaded_at',
+    'liked_at', 'is_nsfw', 'width', 'height', 'byte_size', 'url', 'preview_url', 'tags',
+))
+
+_MAX_INTERNED_TAGS = 4096
+# tag_id -> (the data the tag was built from, the tag)
+_interned_tags: Dict[int, Tuple[Dict, 'Tag']] = {}
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parses an ISO-8601 date, falling back to dateutil for the formats datetime.fromisoformat does not support."""
+    if value is None:
+        return None
+    try:
+        if value.endswith('Z'):
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil.parser import parse
+        return parse(value)
+
+
+def _extra_fields(data: Dict, fields: frozenset) -> Optional[Dict]:
+    # Keys the API may add in the future, still reachable as attributes through __getattr__.
+    keys = data.keys() - fields
+    if keys:
+        return {key.lower(): data[key] for key in keys}
+    return None
+
+
+class _Model:
+    __slots__ = ('extra',)
+
+    def __getattr__(self, item):
+        extra = object.__getattribute__(self, 'extra') if item != 'extra' else None
+        if extra and item in extra:
+            return extra[item]
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{item}'")
+
+
+class Artist(_Model):
     """Represents an API Artist."""
 
+    __slots__ = tuple(_ARTIST_FIELDS)
+
     def __init__(self, data):
-        for key, values in data.items():
-            setattr(self, key.lower(), values)
+        self.artist_id = data.get('artist_id')
+        self.name = data.get('name')
+        self.patreon = data.get('patreon')
+        self.pixiv = data.get('pixiv')
+        self.twitter = data.get('twitter')
+        self.deviant_art = data.get('deviant_art')
+        self.extra = _extra_fields(data, _ARTIST_FIELDS)
 
     def __str__(self):
         return self.name
@@ -14,13 +68,32 @@ class Artist:
     def __eq__(self, other):
         return isinstance(other, Artist) and self.artist_id == other.artist_id
 
+    def __hash__(self):
+        return hash(('artist', self.artist_id))
+
 
-class Tag:
+class Tag(_Model):
     """Represents an API tag."""
 
+    __slots__ = tuple(_TAG_FIELDS)
+
     def __init__(self, data):
-        for key, values in data.items():
-            setattr(self, key.lower(), values)
+        self.tag_id = data.get('tag_id')
+        self.name = data.get('name')
+        self.description = data.get('description')
+        self.is_nsfw = data.get('is_nsfw')
+        self.extra = _extra_fields(data, _TAG_FIELDS)
+
+    @classmethod
+    def from_data(cls, data):
+        """Returns the Tag of the given data, the same instance is shared between every image having this tag."""
+        interned = _interned_tags.get(data.get('tag_id'))
+        # Any change of the tag (e.g. is_nsfw) replaces the interned instance.
+        if interned is None or interned[0] != data:
+            if len(_interned_tags) >= _MAX_INTERNED_TAGS:
+                _interned_tags.clear()
+            interned = _interned_tags[data.get('tag_id')] = (dict(data), cls(data))
+        return interned[1]
 
     def __str__(self):
         return self.name
@@ -28,23 +101,136 @@ class Tag:
     def __eq__(self, other):
         return isinstance(other, Tag) and self.tag_id == other.tag_id
 
+    def __hash__(self):
+        return hash(('tag', self.tag_id))
+
 
-class Image:
+class Image(_Model):
     """Represents an API Image."""
 
+    __slots__ = tuple(_IMAGE_FIELDS)
+
     def __init__(self, data):
-        for key, values in data.items():
-            setattr(self, key.lower(), values)
+        self.signature = data.get('signature')
+        self.extension = data.get('extension')
+        self.image_id = data.get('image_id')
+        self.favorites = data.get('favorites')
+        self.dominant_color = data.get('dominant_color')
+        self.source = data.get('source')
+        self.liked_at = data.get('liked_at')
+        self.is_nsfw = data.get('is_nsfw')
+        self.width = data.get('width')
+        self.height = data.get('height')
+        self.byte_size = data.get('byte_size')
+        self.url = data.get('url')
+        self.preview_url = data.get('preview_url')
+        self.tags = [Tag.from_data(tag) for tag in data.get('tags', ())]
+        artist = data.get('artist')
+        self.artist = Artist(artist) if artist is not None else None
+        self.uploaded_at = parse_datetime(data.get('uploaded_at'))
+        self.extra = _extra_fields(data, _IMAGE_FIELDS)
+
+    def __str__(self):
+        return self.url
+
+    def __eq__(self, other):
+        return isinstance(other, (Image, LazyImage)) and self.image_id == other.image_id
+
+    def __hash__(self):
+        return hash(('image', self.image_id))
+
 
-        self.tags = [Tag(tag) for tag in self.tags]
+_UNSET = object()
 
-        if self.artist is not None:
-            self.artist = Artist(self.artist)
 
-        self.uploaded_at = parse(self.uploaded_at)
+class _RawField:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return instance.raw.get(self.name)
+
+
+class LazyImage:
+    """A lightweight view over the json of an API Image.
+    It has the same attributes as Image but the tags, the artist and the upload date are only built on first access.
+    """
+
+    __slots__ = ('raw', '_tags', '_artist', '_uploaded_at')
+
+    signature = _RawField('signature')
+    extension = _RawField('extension')
+    image_id = _RawField('image_id')
+    favorites = _RawField('favorites')
+    dominant_color = _RawField('dominant_color')
+    source = _RawField('source')
+    liked_at = _RawField('liked_at')
+    is_nsfw = _RawField('is_nsfw')
+    width = _RawField('width')
+    height = _RawField('height')
+    byte_size = _RawField('byte_size')
+    url = _RawField('url')
+    preview_url = _RawField('preview_url')
+
+    def __init__(self, data):
+        self.raw = data
+        self._tags = _UNSET
+        self._artist = _UNSET
+        self._uploaded_at = _UNSET
+
+    @property
+    def tags(self):
+        if self._tags is _UNSET:
+            self._tags = [Tag.from_data(tag) for tag in self.raw.get('tags', ())]
+        return self._tags
+
+    @property
+    def artist(self):
+        if self._artist is _UNSET:
+            artist = self.raw.get('artist')
+            self._artist = Artist(artist) if artist is not None else None
+        return self._artist
+
+    @property
+    def uploaded_at(self):
+        if self._uploaded_at is _UNSET:
+            self._uploaded_at = parse_datetime(self.raw.get('uploaded_at'))
+        return self._uploaded_at
+
+    def __getattr__(self, item):
+        # Keys the API may add in the future.
+        if item != 'raw' and item in self.raw:
+            return self.raw[item]
+        raise AttributeError(f"'LazyImage' object has no attribute '{item}'")
+
+    def to_image(self) -> Image:
+        """Returns a fully built Image."""
+        return Image(self.raw)
 
     def __str__(self):
         return self.url
 
     def __eq__(self, other):
-        return isinstance(other, Image) and self.image_id == other.image_id
+        return isinstance(other, (Image, LazyImage)) and self.image_id == other.image_id
+
+    def __hash__(self):
+        return hash(('image', self.image_id))
+
+
+class BatchResult:
+    """The outcome of one item of a batch operation."""
+
+    __slots__ = ('item', 'result', 'error')
+
+    def __init__(self, item, result=None, error=None):
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
@@ -20,15 +20,42 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE."""
 
+import functools
+import json
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Optional,
+    Union,
+)
+
 from .exceptions import NoToken
 
 APIBaseURL = "https://api.waifu.im/"
 API_VERSION = 'v6'
 
+JSONLoads = Callable[[Union[bytes, str]], Any]
+
+
+def get_default_json_loads() -> JSONLoads:
+    """Returns the fastest json decoder available, orjson or ujson if installed, else the standard library one."""
+    try:
+        import orjson
+        return orjson.loads
+    except ImportError:
+        pass
+    try:
+        import ujson
+        return ujson.loads
+    except ImportError:
+        return json.loads
+
 
 def requires_token(func):
     """A decorator used to check if the user passed a token before trying to use the fav method."""
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if kwargs.get('token'):
             return func(*args, **kwargs)
@@ -37,3 +64,18 @@ def requires_token(func):
         raise NoToken
 
     return wrapper
+
+
+def make_params_key(params: Optional[Dict] = None) -> tuple:
+    """Builds a hashable key from request params, independent of their order and of the order of the list values."""
+    if not params:
+        return ()
+    return tuple(sorted(
+        (k, tuple(sorted(v, key=str)) if isinstance(v, list) else v) for k, v in params.items()
+    ))
+
+
+def make_request_key(endpoint: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> tuple:
+    """Builds a hashable key identifying a request from its endpoint, params and authorization."""
+    auth = headers.get('Authorization') if headers else None
+    return endpoint, make_params_key(params), auth